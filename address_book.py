@@ -0,0 +1,348 @@
+from collections import UserDict
+from typing import Dict, List
+import shlex
+from sqlalchemy.exc import IntegrityError, NoResultFound
+import fuzzy
+from cache import ContactCache
+from bulk import BATCH_SIZE, FORMATS, detect_format, export_contacts, import_contacts
+from model import Records, session, Addresses, Emails, Notes, Phones, Tags, note_tags
+from picker import pick, pick_row
+from queries import iter_contacts, upcoming_birthdays
+from search import search as full_text_search
+from sorter import build_parser, sort_files_entry_point
+from tags import get_or_create, iter_notes_with_tags, tag_cloud, tag_note, titles_of
+from validators import InvalidBirthday, InvalidEmailAddress, InvalidPhoneNumber, \
+    birthday_text, birthday_valid, email_valid, phone_valid
+
+
+class AddressBook(UserDict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # contacts read by the commands, dropped by the writes that touch them
+        self.cache = ContactCache()
+
+    def _resolve_name(self, name: str) -> str:
+        """The name itself when it is registered, otherwise the close match the user picks, if any"""
+        if not name or self.cache.get(session, name=name):
+            return name
+        suggestions = fuzzy.suggest(session, name)
+        if not suggestions:
+            return name
+        option = pick(suggestions + ["None of these"], f"There is no contact {name}. Did you mean:",
+                      indicator="=>")[0]
+        return name if option == "None of these" else option
+
+    def __get_params(self, params: Dict[str, str], msg: str = None) -> List[str]:
+        msg = "Please enter the " if not msg else msg
+        params_keys = list(params.keys())
+        for index in range(len(params)):
+            obj_name = params_keys[index]
+            """If one of the parameters specified in the array is requested, 
+            the input string must be split by the ";" and convert to array."""
+            if obj_name in ["phones", "addresses", "emails", "notes", "tags"]:
+                params[obj_name] = input(f"{msg}{obj_name}. Separator symbol for {obj_name} is \";\": ")
+            else:
+                params[obj_name] = input(f"{msg}{obj_name}: ")
+        return params.values()
+
+    def phone_valid(self, value):
+        self._value = phone_valid(value)
+        return self._value
+
+    def email_valid(self, value):
+        self._value = email_valid(value)
+        return value
+
+    def birthday_valid(self, value):
+        self._value = birthday_valid(value)
+        return self._value
+
+    def add_record(self) -> None:
+        new_record = self.__get_params({"name": "", "phones": "", "birthday": "", "addresses": "", "emails": "", "notes": ""})
+        new_record = [i for i in new_record]
+        try:
+            session.add(Records(name=new_record[0].capitalize(), birthday=self.birthday_valid(new_record[2]),
+                                phones=[Phones(number=self.phone_valid(new_record[1]))], emails=[Emails(title=self.email_valid(new_record[4]))],
+                                addresses=[Addresses(title=new_record[3])], notes=[Notes(title=new_record[5])]))
+            session.commit()
+        except InvalidPhoneNumber:
+            print(f"The phone number {new_record[1]} is invalid")
+        except InvalidEmailAddress:
+            print(f"The email {new_record[4]} is invalid")
+        except InvalidBirthday:
+            print(f"The birthday {new_record[2]} is invalid")
+        except IntegrityError:
+            session.rollback()
+            print(f"The username {new_record[0].capitalize()} is already registered in the address book.")
+
+    def _edit_name(self, contact) -> None:
+        qs = self.cache.get(session, record_id=contact).name
+        print(f"The following user names are registered in the address book: {qs}")
+        new_name = ''.join(self.__get_params({"new name of user": ""})).strip().capitalize()
+        if new_name:
+            try:
+                # uq_records_name_nocase rejects a name that is already taken, whatever its case
+                session.get(Records, contact).name = new_name
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                print(f"The username {new_name} is already registered in the address book. Choose something else.")
+        else:
+            print("You have not provided a new username.")
+
+    def _edit_phone(self, contact) -> None:
+        option = pick_row(session.query(Phones.number, Phones.id).filter(Phones.records_id == contact),
+                          "Select the phone number you want to edit.")
+        if option is None:
+            return
+        print(f"You have selected: {option[0]}")
+        new_number = ''.join(self.__get_params({"new phone number": ""})).strip()
+        try:
+            session.get(Phones, option[1]).number = self.phone_valid(new_number)
+            session.commit()
+        except InvalidPhoneNumber:
+            print("You entered an invalid phone number.This data is not recorded.")
+
+    def _edit_birthday(self, contact) -> None:
+        qs = self.cache.get(session, record_id=contact)
+        print(f"Current birthday of user {birthday_text(qs.birthday)}")
+        new_birthday = ''.join(self.__get_params({"birthday of user": ""})).strip()
+        try:
+            session.get(Records, contact).birthday = self.birthday_valid(new_birthday)
+            session.commit()
+        except InvalidBirthday:
+            print("You entered an invalid birthday.This data is not recorded.")
+
+    def _edit_address(self, contact) -> None:
+        option = pick_row(session.query(Addresses.title, Addresses.id).filter(Addresses.records_id == contact),
+                          "Select the address you want to edit.")
+        if option is None:
+            return
+        print(f"You have selected: {option[0]}")
+        new_address = ''.join(self.__get_params({"new address": ""})).strip()
+        if new_address:
+            session.get(Addresses, option[1]).title = new_address
+            session.commit()
+
+    def _edit_email(self, contact) -> None:
+        option = pick_row(session.query(Emails.title, Emails.id).filter(Emails.records_id == contact),
+                          "Select the email you want to edit.")
+        if option is None:
+            return
+        print(f"You have selected: {option[0]}")
+        new_email = ''.join(self.__get_params({"new email": ""})).strip()
+        if new_email:
+            try:
+                self.email_valid(new_email)
+                session.get(Emails, option[1]).title = new_email
+                session.commit()
+            except InvalidEmailAddress:
+                print("You entered an invalid email address.This data is not recorded.")
+        else:
+            print("You have not provided a new email.")
+
+    def _edit_note(self, contact) -> None:
+        option = pick_row(session.query(Notes.title, Notes.id).filter(Notes.records_id == contact),
+                          "Select the note you want to edit.")
+        if option is None:
+            return
+        print(f"You have selected: {option[0]}")
+        new_note = ''.join(self.__get_params({"new note": ""})).strip()
+        if new_note:
+            try:
+                session.get(Notes, option[1]).title = new_note
+                session.commit()
+            except InvalidEmailAddress:
+                print("You entered an invalid note address.This data is not recorded.")
+        else:
+            print("You have not provided a new note.")
+
+    def _edit_tag(self, contact) -> None:
+        qs = session.query(Tags.title, Tags.id).join(note_tags, note_tags.c.tag_id == Tags.id) \
+            .join(Notes, Notes.id == note_tags.c.note_id).filter(Notes.records_id == contact).distinct()
+        option = pick_row(qs, "Select the tag for which you want to edit.")
+        if option is None:
+            return
+        print(f"You have selected: {option[0]}")
+        new_tag = ''.join(self.__get_params({"new tag": ""})).strip()
+        if new_tag:
+            # tags are shared, so only the notes of this contact move to the new one
+            old_tag, tag = session.get(Tags, option[1]), get_or_create(session, [new_tag])[0]
+            for note in session.query(Notes).filter(Notes.records_id == contact, Notes.tags.contains(old_tag)):
+                note.tags.remove(old_tag)
+                if tag not in note.tags:
+                    note.tags.append(tag)
+            session.commit()
+
+    def edit_record(self) -> None:
+        option = pick_row(session.query(Records.name, Records.id),
+                          "Select the name of the user whose data you want to edit.")
+        contact = option and self.cache.get(session, record_id=option[1])
+        if contact:
+            function_names = [self._edit_name, self._edit_phone, self._edit_birthday, \
+                self._edit_address, self._edit_email, self._edit_note, self._edit_tag]
+            description_function = ["Edit user name", "Edit phone", \
+                "Edit birthday", "Edit addresses", "Edit emails", \
+                "Edit notes", "Edit tags", "FINISH EDITING"]
+            base_msg = f"Select what information for the user {contact.name} you would like to change.\n{'='*60}"
+            option, index = pick(description_function, base_msg, indicator="=>")
+            while index != len(description_function)-1:
+                print(f"You have selected an {option} option.\nLet's continue.\n{'='*60}")
+                function_names[index](contact.id)
+                contact = self.cache.get(session, record_id=contact.id) or contact
+                base_msg = f"Select what information for the user {contact.name} you would like to change.\n{'='*60}"
+                option, index = pick(description_function, base_msg, indicator="=>")
+
+    def add_tags(self) -> None:
+        name_contact = self._resolve_name(''.join(self.__get_params({"name of contact": ""})).capitalize())
+        if self.cache.get(session, name=name_contact) is None:
+            print(f"The user {name_contact} was not found in the address book.")
+            return
+        qs = session.query(Notes.title, Notes.id).join(Records).filter(Records.name == name_contact)
+        option = pick_row(qs, "Select the note where you want to add tags:")
+        if option is None:
+            return
+        base_msg = f"Specify tags that you want to add to the selected note by {option[0]}. "
+        new_tags = titles_of(''.join(self.__get_params({f"{base_msg}": ""})))
+        if new_tags:
+            tag_note(session, session.get(Notes, option[1]), new_tags)
+            session.commit()
+
+    def del_contact(self) -> None:
+        name_contact = self._resolve_name(''.join(self.__get_params({"contact": ""})).capitalize())
+        try:
+            record_id, = session.query(Records.id).filter(Records.name == name_contact).one()
+            session.delete(session.get(Records, record_id))
+            session.commit()
+            print(f"Contact {name_contact} was removed!")
+        except NoResultFound:
+            print(f"Contact {name_contact} not found!")
+
+    def holidays_period(self) -> None:
+        try:
+            period = int(''.join(self.__get_params({"period": ""})))
+        except ValueError:
+            print('Only number allowed!')
+        else:
+            if period < 0:
+                print("The period cannot be negative!")
+                return
+            if period > 365:
+                period = 365
+            print(f"Found birthdays for {period} days period: ")
+            result = upcoming_birthdays(session, period)
+            if not result:
+                result.append(f"No contacts with birthdays for this period.")
+            print('\n'.join(result))
+
+    def find_contact(self) -> None:
+        search_info = self._resolve_name(''.join(self.__get_params({"search info": ""})).capitalize())
+        contact = self.cache.get(session, name=search_info)
+        if contact:
+            result = [f"Search results for string \"name: {contact.name} birthday: {birthday_text(contact.birthday)} "
+                      f"phones: {[i.number for i in contact.phones]} emails: {[i.title for i in contact.emails]} "
+                      f"addreses: {[i.title for i in contact.addresses]}\": "]
+            print('\n'.join(result))
+        else:
+            print(f"There is no contact with name: {search_info}.")
+
+    def sort_files(self) -> None:
+        """Accepts a path optionally followed by sorter options, e.g. ~/Downloads --workers 8"""
+        try:
+            args = build_parser().parse_args(shlex.split(''.join(self.__get_params({"path": ""}))))
+        except SystemExit:
+            return
+        sort_files_entry_point(args.path, args.workers, args.dry_run, args.journal, args.dedup, args.hash_db,
+                               args.watch, args.debounce, args.categories, args.sniff, args.processes)
+
+    def _find_contact(self, message: str):
+        name_contact = self._resolve_name(''.join(self.__get_params({message: ""})).capitalize())
+        contact = self.cache.get(session, name=name_contact)
+        if contact:
+            return contact.id
+        print("There is no contact with provided name.")
+
+    def add_note(self) -> None:
+        record = self._find_contact("contact to add a note")
+        if record:
+            note = ''.join(self.__get_params({"new note": ""})).strip()
+            session.add(Notes(title=note, records_id=record))
+            session.commit()
+            print("Note was added.")
+
+    def print_notes(self) -> None:
+        record = self._find_contact("contact to display")
+        if record:
+            contact = self.cache.get(session, record_id=record)
+            for i in contact.notes:
+                print(i.title)
+
+    def del_note(self) -> None:
+        record = self._find_contact("contact")
+        qs = session.query(Notes.title, Notes.id).filter(Notes.records_id == record)
+        option = pick_row(qs, "Select the note you want to delete:") if record else None
+        if option:
+            session.delete(session.get(Notes, option[1]))
+            session.commit()
+            print("Note was deleted.")
+
+    def find_sort_note(self) -> None:
+        tag_name = "".join(self.__get_params({"tag name": ""}))
+        for page in iter_notes_with_tags(session, [tag_name]):
+            for _, title, name in page:
+                print(f"{name:<20} {title}")
+
+    def find_notes_by_tags(self) -> None:
+        titles, mode = self.__get_params({"tags": "", "match (all/any)": ""})
+        match_all = mode.strip().lower() != "any"
+        found = False
+        for page in iter_notes_with_tags(session, titles_of(titles), match_all):
+            found = True
+            for _, title, name in page:
+                print(f"{name:<20} {title}")
+        if not found:
+            print("No notes found.")
+
+    def tag_cloud(self) -> None:
+        for title, count in tag_cloud(session):
+            print(f"{title:<20} {count}")
+
+    def search(self) -> None:
+        query = ''.join(self.__get_params({"search text": ""})).strip()
+        result = full_text_search(session, query)
+        if not result:
+            print(f"Nothing found for: {query}.")
+        for name, kind, body in result:
+            print(f"{name:<20} {kind:<10} {body}")
+
+    def import_contacts(self) -> None:
+        path, batch_size = self.__get_params({"path to a .csv, .jsonl or .vcf file": "", "batch size": ""})
+        if detect_format(path) not in FORMATS:
+            print(f"Unknown file format. Supported formats: {', '.join(FORMATS)}.")
+            return
+        try:
+            batch_size = int(batch_size or BATCH_SIZE)
+        except ValueError:
+            print('Only number allowed!')
+            return
+        try:
+            imported, rejected, seconds = import_contacts(session, path, batch_size=batch_size)
+        except FileNotFoundError:
+            print(f"File {path} not found!")
+        else:
+            print(f"Imported {imported} contacts in {seconds:.2f}s ({imported / max(seconds, 1e-9):.0f} rows/s).")
+            if rejected:
+                print(f"{rejected} invalid rows were written to {path}.rejects.jsonl")
+
+    def export_contacts(self) -> None:
+        path = ''.join(self.__get_params({"path to a .csv, .jsonl or .vcf file": ""}))
+        if detect_format(path) not in FORMATS:
+            print(f"Unknown file format. Supported formats: {', '.join(FORMATS)}.")
+            return
+        print(f"Exported {export_contacts(session, path)} contacts to {path}.")
+
+    def show_contacts(self):
+        for page in iter_contacts(session):
+            for i in page:
+                print((i.name, birthday_text(i.birthday), [j.number for j in i.phones]))
+            session.expunge_all()
@@ -0,0 +1,41 @@
+"""Add lookup indexes
+
+Revision ID: 2eca63dd8789
+Revises: b00851798813
+Create Date: 2026-10-18 11:52:37.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2eca63dd8789'
+down_revision = 'b00851798813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # names that differ only in case would break the unique index, keep the oldest as is
+    op.execute("UPDATE records SET name = name || ' ' || id WHERE id NOT IN "
+               "(SELECT min(id) FROM records GROUP BY name COLLATE NOCASE)")
+    op.create_index(op.f('ix_records_name'), 'records', ['name'], unique=False)
+    op.create_index('uq_records_name_nocase', 'records', [sa.text('name COLLATE NOCASE')], unique=True)
+    op.create_index(op.f('ix_phones_records_id'), 'phones', ['records_id'], unique=False)
+    op.create_index(op.f('ix_emails_records_id'), 'emails', ['records_id'], unique=False)
+    op.create_index(op.f('ix_addresses_records_id'), 'addresses', ['records_id'], unique=False)
+    op.create_index(op.f('ix_notes_records_id'), 'notes', ['records_id'], unique=False)
+    op.create_index(op.f('ix_tags_notes_id'), 'tags', ['notes_id'], unique=False)
+    op.create_index(op.f('ix_tags_title'), 'tags', ['title'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_tags_title'), table_name='tags')
+    op.drop_index(op.f('ix_tags_notes_id'), table_name='tags')
+    op.drop_index(op.f('ix_notes_records_id'), table_name='notes')
+    op.drop_index(op.f('ix_addresses_records_id'), table_name='addresses')
+    op.drop_index(op.f('ix_emails_records_id'), table_name='emails')
+    op.drop_index(op.f('ix_phones_records_id'), table_name='phones')
+    op.drop_index('uq_records_name_nocase', table_name='records')
+    op.drop_index(op.f('ix_records_name'), table_name='records')
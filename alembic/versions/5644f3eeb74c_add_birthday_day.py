@@ -0,0 +1,50 @@
+"""Add indexed birthday day
+
+Revision ID: 5644f3eeb74c
+Revises: 7f3695b8d181
+Create Date: 2026-10-18 09:40:03.551872
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5644f3eeb74c'
+down_revision = '7f3695b8d181'
+branch_labels = None
+depends_on = None
+
+BATCH = 10000
+
+
+def _birthday_day(birthday: str):
+    # "%d.%m.%Y" also accepts the unpadded "1.2.1990" that was stored as typed
+    try:
+        birthday = datetime.strptime(birthday.strip(), "%d.%m.%Y")
+    except (AttributeError, ValueError):
+        return None
+    return birthday.month * 100 + birthday.day
+
+
+def upgrade():
+    op.add_column('records', sa.Column('birthday_day', sa.Integer(), nullable=True))
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.text("SELECT id, birthday FROM records WHERE id > :last_id "
+                                          "AND birthday IS NOT NULL ORDER BY id LIMIT :batch"),
+                                  {"last_id": last_id, "batch": BATCH}).all()
+        if not rows:
+            break
+        connection.execute(sa.text("UPDATE records SET birthday_day = :day WHERE id = :id"),
+                           [{"id": i, "day": _birthday_day(birthday)} for i, birthday in rows])
+        last_id = rows[-1][0]
+    op.create_index(op.f('ix_records_birthday_day'), 'records', ['birthday_day'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_records_birthday_day'), table_name='records')
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.drop_column('birthday_day')
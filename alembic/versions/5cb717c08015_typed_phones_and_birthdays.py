@@ -0,0 +1,100 @@
+"""Typed phones and birthdays
+
+Revision ID: 5cb717c08015
+Revises: e46c86a9bb74
+Create Date: 2026-10-18 18:12:27.904113
+
+"""
+import re
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5cb717c08015'
+down_revision = 'e46c86a9bb74'
+branch_labels = None
+depends_on = None
+
+BATCH = 10000
+# validators.phone_valid and birthday_valid as of this revision, later changes must not alter what it did
+E164_PATTERN = re.compile(r"\+[1-9]\d{7,14}")
+PHONE_SEPARATORS = re.compile(r"[\s\-().]")
+DEFAULT_COUNTRY_CODE = "380"
+
+
+def _e164(number: str):
+    number = PHONE_SEPARATORS.sub("", number)
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    elif number.startswith("0"):
+        number = "+" + DEFAULT_COUNTRY_CODE + number[1:]
+    elif number.startswith(DEFAULT_COUNTRY_CODE):
+        number = "+" + number
+    return number if E164_PATTERN.fullmatch(number) else None
+
+
+def _normalize(number) -> str:
+    # numbers were 13 characters and the INTEGER column kept 13 digits as typed, turned "+380501234567"
+    # into 380501234567 and stripped leading zeros; what a shorter number lost cannot be told, it stays text
+    text = str(number)
+    if isinstance(number, int) and len(text) == 12:
+        text = f"+{text}"
+    elif isinstance(number, int) and len(text) < 12:
+        return text
+    return _e164(text) or str(number)
+
+
+def _birthday(birthday) -> dict:
+    # "%d.%m.%Y" also reads the unpadded "1.2.1990" stored as typed, only text it rejects is dropped
+    try:
+        birthday = datetime.strptime(birthday.strip(), "%d.%m.%Y").date()
+    except (AttributeError, ValueError):
+        return {"date": None, "day": None}
+    return {"date": birthday.isoformat(), "day": birthday.month * 100 + birthday.day}
+
+
+def upgrade():
+    # the typed columns are added next to the old ones, so the table, its triggers and indexes stay in place
+    op.add_column('records', sa.Column('birthday_date', sa.Date(), nullable=True))
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.text("SELECT id, birthday FROM records WHERE id > :last_id "
+                                          "AND birthday IS NOT NULL ORDER BY id LIMIT :batch"),
+                                  {"last_id": last_id, "batch": BATCH}).all()
+        if not rows:
+            break
+        connection.execute(sa.text("UPDATE records SET birthday_date = :date, birthday_day = :day WHERE id = :id"),
+                           [{"id": i, **_birthday(birthday)} for i, birthday in rows])
+        last_id = rows[-1][0]
+    op.drop_column('records', 'birthday')
+    op.alter_column('records', 'birthday_date', new_column_name='birthday')
+
+    op.add_column('phones', sa.Column('e164', sa.String(length=16), nullable=True))
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.text("SELECT id, number FROM phones WHERE id > :last_id AND number IS NOT NULL "
+                                          "ORDER BY id LIMIT :batch"), {"last_id": last_id, "batch": BATCH}).all()
+        if not rows:
+            break
+        connection.execute(sa.text("UPDATE phones SET e164 = :number WHERE id = :id"),
+                           [{"id": i, "number": _normalize(number)} for i, number in rows])
+        last_id = rows[-1][0]
+    op.drop_column('phones', 'number')
+    op.alter_column('phones', 'e164', new_column_name='number')
+    op.create_index(op.f('ix_phones_number'), 'phones', ['number'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_phones_number'), table_name='phones')
+    op.alter_column('phones', 'number', new_column_name='e164')
+    op.add_column('phones', sa.Column('number', sa.Integer(), nullable=True))
+    op.execute("UPDATE phones SET number = e164")
+    op.drop_column('phones', 'e164')
+
+    op.alter_column('records', 'birthday', new_column_name='birthday_date')
+    op.add_column('records', sa.Column('birthday', sa.String(), nullable=True))
+    op.execute("UPDATE records SET birthday = strftime('%d.%m.%Y', birthday_date)")
+    op.drop_column('records', 'birthday_date')
@@ -0,0 +1,49 @@
+"""Add full-text search index
+
+Revision ID: b00851798813
+Revises: 5644f3eeb74c
+Create Date: 2026-10-18 10:27:15.930114
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b00851798813'
+down_revision = '5644f3eeb74c'
+branch_labels = None
+depends_on = None
+
+
+# a copy of the search.py DDL as of this revision, so later changes there do not rewrite history;
+# index rows are keyed by id * 8 + the kind code of their table
+SOURCES = (("records", "name", 0), ("notes", "title", 1), ("tags", "title", 2),
+           ("addresses", "title", 3), ("emails", "title", 4))
+
+
+def _triggers(table, column, code):
+    insert = (f"INSERT INTO search_index(rowid, body, kind, ref_id) "
+              f"VALUES (new.id * 8 + {code}, new.{column}, '{table}', new.id);")
+    delete = f"DELETE FROM search_index WHERE rowid = old.id * 8 + {code};"
+    return [
+        f"CREATE TRIGGER {table}_search_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {table}_search_au AFTER UPDATE OF {column} ON {table} BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER {table}_search_ad AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+
+
+def upgrade():
+    op.execute("CREATE VIRTUAL TABLE search_index USING fts5(body, kind UNINDEXED, ref_id UNINDEXED, "
+               "prefix='2 3', tokenize='unicode61 remove_diacritics 2')")
+    for table, column, code in SOURCES:
+        for statement in _triggers(table, column, code):
+            op.execute(statement)
+        op.execute(f"INSERT INTO search_index(rowid, body, kind, ref_id) "
+                   f"SELECT id * 8 + {code}, {column}, '{table}', id FROM {table} WHERE {column} IS NOT NULL")
+
+
+def downgrade():
+    for table, _, _ in SOURCES:
+        for suffix in ("ai", "au", "ad"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{suffix}")
+    op.execute("DROP TABLE IF EXISTS search_index")
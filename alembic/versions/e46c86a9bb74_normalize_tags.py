@@ -0,0 +1,94 @@
+"""Normalize tags
+
+Revision ID: e46c86a9bb74
+Revises: 2eca63dd8789
+Create Date: 2026-10-18 14:06:41.502317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e46c86a9bb74'
+down_revision = '2eca63dd8789'
+branch_labels = None
+depends_on = None
+
+# the usage_count triggers of model.TAG_COUNT_TRIGGERS as of this revision
+TAG_COUNT_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS note_tags_count_ai AFTER INSERT ON note_tags BEGIN "
+    "UPDATE tags SET usage_count = usage_count + 1 WHERE id = new.tag_id; END",
+    "CREATE TRIGGER IF NOT EXISTS note_tags_count_ad AFTER DELETE ON note_tags BEGIN "
+    "UPDATE tags SET usage_count = usage_count - 1 WHERE id = old.tag_id; END",
+)
+
+
+def _reindex_tags():
+    """The search triggers left with the renamed table, so they are created again and the tag rows refilled"""
+    insert = ("INSERT INTO search_index(rowid, body, kind, ref_id) "
+              "VALUES (new.id * 8 + 2, new.title, 'tags', new.id);")
+    delete = "DELETE FROM search_index WHERE rowid = old.id * 8 + 2;"
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS tags_search_ai AFTER INSERT ON tags BEGIN {insert} END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS tags_search_au AFTER UPDATE OF title ON tags BEGIN {delete} {insert} END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS tags_search_ad AFTER DELETE ON tags BEGIN {delete} END")
+    op.execute("DELETE FROM search_index WHERE kind = 'tags'")
+    op.execute("INSERT INTO search_index(rowid, body, kind, ref_id) "
+               "SELECT id * 8 + 2, title, 'tags', id FROM tags WHERE title IS NOT NULL")
+
+
+def upgrade():
+    # the per-note copies move aside and are folded into one tag per title, whatever its case
+    op.drop_index('ix_tags_title', table_name='tags')
+    op.drop_index('ix_tags_notes_id', table_name='tags')
+    op.execute("ALTER TABLE tags RENAME TO tags_old")
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(collation='NOCASE'), nullable=False),
+    sa.Column('usage_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('title')
+    )
+    op.create_index('ix_tags_usage_count', 'tags', [sa.text('usage_count DESC'), 'title'], unique=False)
+    op.create_table('note_tags',
+    sa.Column('note_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['note_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('note_id', 'tag_id'),
+    sqlite_with_rowid=False
+    )
+    op.create_index('ix_note_tags_tag_id', 'note_tags', ['tag_id', 'note_id'], unique=False)
+    # the oldest row of each title keeps its id, so search results pointing at it stay valid
+    op.execute("INSERT INTO tags (id, title) SELECT min(id), trim(title) FROM tags_old "
+               "WHERE trim(coalesce(title, '')) != '' AND notes_id IN (SELECT id FROM notes) "
+               "GROUP BY trim(title) COLLATE NOCASE")
+    op.execute("INSERT OR IGNORE INTO note_tags (note_id, tag_id) SELECT o.notes_id, t.id FROM tags_old o "
+               "JOIN tags t ON t.title = trim(o.title) JOIN notes n ON n.id = o.notes_id")
+    op.execute("UPDATE tags SET usage_count = (SELECT count(*) FROM note_tags WHERE tag_id = tags.id)")
+    for statement in TAG_COUNT_TRIGGERS:
+        op.execute(statement)
+    op.drop_table('tags_old')
+    _reindex_tags()
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS note_tags_count_ai")
+    op.execute("DROP TRIGGER IF EXISTS note_tags_count_ad")
+    op.execute("ALTER TABLE tags RENAME TO tags_new")
+    op.drop_index('ix_tags_usage_count', table_name='tags_new')
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('notes_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['notes_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO tags (title, notes_id) SELECT t.title, nt.note_id FROM note_tags nt "
+               "JOIN tags_new t ON t.id = nt.tag_id ORDER BY nt.note_id, t.id")
+    op.drop_index('ix_note_tags_tag_id', table_name='note_tags')
+    op.drop_table('note_tags')
+    op.drop_table('tags_new')
+    op.create_index(op.f('ix_tags_notes_id'), 'tags', ['notes_id'], unique=False)
+    op.create_index(op.f('ix_tags_title'), 'tags', ['title'], unique=False)
+    _reindex_tags()
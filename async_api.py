@@ -0,0 +1,163 @@
+"""asyncio service over the address book for concurrent clients.
+
+The coroutines take and return plain values. Each call runs one of the operations in its own
+session and transaction on SQLAlchemy's async engine (aiosqlite), so the same model.py
+mappings and rules serve the CLI and the service.
+
+    python async_api.py --socket /tmp/address_book.sock
+
+serves JSON lines: {"command": "find_contact", "args": {"name": "Anna"}} per request and
+{"ok": true, "result": ...} or {"ok": false, "error": "..."} per response.
+"""
+import argparse
+import asyncio
+import json
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy import create_engine as create_sync_engine, event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+import fuzzy
+import metrics
+import model
+import operations
+from operations import OperationError
+
+SOCKET_PATH = "address_book.sock"
+
+
+def async_url(url: str = None) -> str:
+    return (url or model.DB_URL).replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+
+def create_engine(url: str = None):
+    engine = create_async_engine(async_url(url))
+    event.listen(engine.sync_engine, "connect", model.set_sqlite_pragma)
+    metrics.instrument(engine.sync_engine)
+    return engine
+
+
+class AddressBookService:
+
+    def __init__(self, engine=None):
+        self.engine = engine or create_engine()
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self._sync_engine = None
+
+    def warm(self) -> threading.Thread:
+        """Builds the typo index on a thread with a sync engine of its own, away from the event loop"""
+        if self._sync_engine is None:
+            self._sync_engine = create_sync_engine(self.engine.url.set(drivername="sqlite"),
+                                                   connect_args={"check_same_thread": False})
+            event.listen(self._sync_engine, "connect", model.set_sqlite_pragma)
+        return fuzzy.warm(sessionmaker(self._sync_engine))
+
+    async def call(self, command: str, **args):
+        """Runs one operation in its own transaction, OperationError is raised unchanged"""
+        async with self.session_factory() as session:
+            async with session.begin():
+                return await session.run_sync(operations.run, command, args)
+
+    async def add_contact(self, name: str, birthday: str = "", phones=(), emails=(), addresses=(),
+                          notes=()) -> Dict:
+        return await self.call("add_contact", name=name, birthday=birthday, phones=phones, emails=emails,
+                               addresses=addresses, notes=notes)
+
+    async def edit_contact(self, name: str, **changes) -> Dict:
+        return await self.call("edit_contact", name=name, **changes)
+
+    async def del_contact(self, name: str) -> Dict:
+        return await self.call("del_contact", name=name)
+
+    async def find_contact(self, name: str) -> Dict:
+        return await self.call("find_contact", name=name)
+
+    async def show_contacts(self, after_id: int = 0, limit: int = 100) -> List[Dict]:
+        return await self.call("show_contacts", after_id=after_id, limit=limit)
+
+    async def add_note(self, name: str, note: str) -> Dict:
+        return await self.call("add_note", name=name, note=note)
+
+    async def del_note(self, note_id: int) -> Dict:
+        return await self.call("del_note", note_id=note_id)
+
+    async def notes(self, name: str) -> List[Dict]:
+        return await self.call("print_notes", name=name)
+
+    async def add_tag(self, note_id: int, tag: str) -> Dict:
+        return await self.call("add_tag", note_id=note_id, tag=tag)
+
+    async def find_note(self, tag: str) -> List[Dict]:
+        return await self.call("find_note", tag=tag)
+
+    async def find_notes(self, tags: List[str], match: str = "all", after_id: int = 0,
+                         limit: int = 100) -> List[Dict]:
+        return await self.call("find_notes", tags=tags, match=match, after_id=after_id, limit=limit)
+
+    async def tag_cloud(self, limit: int = 50) -> List[Dict]:
+        return await self.call("tag_cloud", limit=limit)
+
+    async def birthdays(self, period: int) -> List[str]:
+        return await self.call("holidays_period", period=period)
+
+    async def search(self, query: str, limit: int = 20) -> List[Dict]:
+        return await self.call("search", query=query, limit=limit)
+
+    async def close(self) -> None:
+        await self.engine.dispose()
+        if self._sync_engine is not None:
+            self._sync_engine.dispose()
+
+
+async def handle_request(service: AddressBookService, line: bytes) -> Dict:
+    """The response to one request line; any error becomes an error response, the connection stays open"""
+    try:
+        request = json.loads(line)
+        return {"ok": True, "result": await service.call(request["command"], **request.get("args", {}))}
+    except (OperationError, SQLAlchemyError, ValueError, KeyError, TypeError) as e:
+        return {"ok": False, "error": str(e)}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+async def serve(service: AddressBookService, path: str = SOCKET_PATH) -> asyncio.AbstractServer:
+    """Unix-socket server answering one JSON line per request line, requests of a client run in order.
+    The typo index starts building as the server starts, lookups get suggestions once it is ready."""
+    service.warm()
+
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await handle_request(service, line)
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_unix_server(client, path=path)
+
+
+async def main(path: str, url: Optional[str]) -> None:
+    service = AddressBookService(create_engine(url))
+    server = await serve(service, path)
+    print(f"Serving the address book on {path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the address book over a Unix socket.")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--db-url", help=f"SQLAlchemy URL of the database, {model.DB_URL} by default")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.socket, args.db_url))
+    except KeyboardInterrupt:
+        pass
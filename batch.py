@@ -0,0 +1,131 @@
+import argparse
+import json
+import sys
+from datetime import date
+from typing import Dict, Iterable, Iterator, TextIO, Tuple
+from sqlalchemy.exc import SQLAlchemyError
+import operations
+from operations import OperationError
+
+BATCH_SIZE = 1000
+
+
+class ScriptError(ValueError):
+    """Exception for a script line that is no command, passed on in place of its arguments"""
+
+
+def parse_argv(argv) -> Tuple[str, Dict]:
+    """`add_note name=Anna note=call back` style arguments, a value is JSON when it parses as JSON"""
+    command, args = argv[0], {}
+    for item in argv[1:]:
+        key, _, value = item.partition("=")
+        try:
+            args[key] = json.loads(value)
+        except ValueError:
+            args[key] = value
+    return command, args
+
+
+def read_script(lines: Iterable[str]) -> Iterator[Tuple[str, Dict]]:
+    """JSON lines like {"command": "add_contact", "args": {"name": "Anna"}}.
+    A line that is no such object gives (None, ScriptError), so the lines after it still run."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            command, args = item["command"], item.get("args", {})
+            if not isinstance(command, str) or not isinstance(args, dict):
+                raise ValueError("command must be a string and args an object")
+        except ValueError as e:
+            yield None, ScriptError(f"Line {number} is not valid JSON: {e}")
+        except (KeyError, TypeError, AttributeError):
+            yield None, ScriptError(f"Line {number} has no command")
+        else:
+            yield command, args
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def run_batch(session, commands: Iterable[Tuple[str, Dict]], out: TextIO = sys.stdout,
+              batch_size: int = BATCH_SIZE) -> bool:
+    """Runs commands in one session, committing once per `batch_size` commands.
+
+    Every command writes one JSON line to `out`. A rejected command does not touch the session,
+    a database or any other unexpected error rolls the whole current batch back and reports it on
+    every pending line.
+    """
+    ok, pending = True, []
+
+    def finish(error: str = None) -> None:
+        nonlocal ok
+        if error is None:
+            try:
+                session.commit()
+            except SQLAlchemyError as e:
+                session.rollback()
+                error = str(e.orig if getattr(e, "orig", None) else e)
+        for line in pending:
+            if error is not None and line["ok"]:
+                ok = line["ok"] = False
+                line["error"] = f"Batch rolled back: {error}"
+            out.write(json.dumps(line, ensure_ascii=False, default=_default) + "\n")
+        pending.clear()
+        session.expunge_all()
+
+    for command, args in commands:
+        line = {"command": command, "ok": True}
+        try:
+            if isinstance(args, ScriptError):
+                raise args
+            line["result"] = operations.run(session, command, args)
+        except (OperationError, ValueError) as e:
+            ok = line["ok"] = False
+            line["error"] = str(e)
+        except Exception as e:
+            # a database error, or one the operation did not foresee, leaves the session in an unknown state
+            session.rollback()
+            if isinstance(e, SQLAlchemyError):
+                error = str(e.orig if getattr(e, "orig", None) else e)
+            else:
+                error = f"{type(e).__name__}: {e}"
+            ok = line["ok"] = False
+            line["error"] = error
+            pending.append(line)
+            finish(error)
+            continue
+        pending.append(line)
+        if len(pending) >= batch_size:
+            finish()
+    finish()
+    out.flush()
+    return ok
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="personal_manager.py",
+                                     description="Run address book commands without prompts.")
+    parser.add_argument("--script", help="file with JSON-lines commands, - for stdin")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="commands per transaction")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="command followed by key=value arguments")
+    return parser
+
+
+def main(session, argv) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    batch_size = max(1, args.batch_size)
+    if args.command:
+        ok = run_batch(session, [parse_argv(args.command)], batch_size=batch_size)
+    elif args.script == "-":
+        ok = run_batch(session, read_script(sys.stdin), batch_size=batch_size)
+    elif args.script:
+        with open(args.script, encoding="utf-8") as script:
+            ok = run_batch(session, read_script(script), batch_size=batch_size)
+    else:
+        parser.error("give a command or --script")
+    return 0 if ok else 1
@@ -0,0 +1,85 @@
+"""Load generator for the async_api socket server: p50/p99 latency and throughput at
+1, 10 and 100 concurrent clients on a scratch database.
+
+    python benchmarks/bench_async.py [contacts] [requests per client]
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sqlalchemy import create_engine
+import async_api
+import model
+import search
+from model import Base
+
+CONCURRENCY = (1, 10, 100)
+
+
+def requests(rnd: random.Random, contacts: int):
+    """(request, whether it succeeds) pairs; a misspelled name is answered with suggestions in the error"""
+    while True:
+        name = f"Contact{rnd.randrange(contacts)}"
+        yield rnd.choice([
+            ({"command": "find_contact", "args": {"name": name}}, True),
+            ({"command": "find_contact", "args": {"name": f"Cnotact{name[7:]}"}}, False),
+            ({"command": "search", "args": {"query": name[:9], "limit": 10}}, True),
+            ({"command": "holidays_period", "args": {"period": 7}}, True),
+            ({"command": "add_note", "args": {"name": name, "note": "called back"}}, True),
+        ])
+
+
+async def client(path: str, seed: int, contacts: int, count: int, latencies: list) -> None:
+    reader, writer = await asyncio.open_unix_connection(path, limit=2 ** 24)
+    generator = requests(random.Random(seed), contacts)
+    for _ in range(count):
+        request, ok = next(generator)
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if response["ok"] != ok:
+            raise RuntimeError(response.get("error") or f"{request} was expected to fail")
+    writer.close()
+
+
+async def run(contacts: int, count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        sync_engine = create_engine(url)
+        Base.metadata.create_all(sync_engine)
+        with sync_engine.begin() as connection:
+            search.install(connection)
+            connection.execute(model.Records.__table__.insert(),
+                               [{"name": f"Contact{i}", "birthday": date(1990, 2, 1), "birthday_day": 201}
+                                for i in range(contacts)])
+        sync_engine.dispose()
+        service = async_api.AddressBookService(async_api.create_engine(url))
+        path = os.path.join(tmp, "bench.sock")
+        server = await async_api.serve(service, path)
+        print(f"{'clients':>8} {'requests':>9} {'p50':>9} {'p99':>9} {'req/s':>8}")
+        for clients in CONCURRENCY:
+            latencies = []
+            start = time.perf_counter()
+            await asyncio.gather(*[client(path, n, contacts, count, latencies) for n in range(clients)])
+            elapsed = time.perf_counter() - start
+            latencies.sort()
+            print(f"{clients:>8} {len(latencies):>9} {statistics.median(latencies) * 1000:>7.2f}ms "
+                  f"{latencies[int(len(latencies) * 0.99)] * 1000:>7.2f}ms {len(latencies) / elapsed:>8.0f}")
+        server.close()
+        await server.wait_closed()
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+                    int(sys.argv[2]) if len(sys.argv) > 2 else 200))
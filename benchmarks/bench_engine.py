@@ -0,0 +1,61 @@
+"""Commit latency of add_record-style transactions and name lookups with the SQLite
+defaults (rollback journal, synchronous=FULL) versus the engine profile from model.py.
+
+    python benchmarks/bench_engine.py [transactions]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+import model
+from model import Addresses, Base, Emails, Notes, Phones, Records
+
+DEFAULTS = {"journal_mode": "DELETE", "synchronous": "FULL", "cache_size": "-2000", "mmap_size": "0",
+            "temp_store": "DEFAULT", "busy_timeout": "0"}
+
+
+def measure(path: str, pragmas, transactions: int):
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", lambda dbapi_connection, _: model.apply_profile(dbapi_connection, pragmas))
+    Base.metadata.create_all(engine)
+    writes, reads = [], []
+    with Session(engine) as session:
+        for i in range(transactions):
+            start = time.perf_counter()
+            session.add(Records(name=f"Contact{i}", birthday="01.02.1990", phones=[Phones(number="+380501234567")],
+                                emails=[Emails(title=f"c{i}@mail.com")], addresses=[Addresses(title="Street 1")],
+                                notes=[Notes(title="note")]))
+            session.commit()
+            writes.append(time.perf_counter() - start)
+        for i in range(transactions):
+            start = time.perf_counter()
+            session.query(Records.id).filter(Records.name == f"Contact{i}").one()
+            session.commit()
+            reads.append(time.perf_counter() - start)
+    engine.dispose()
+    return writes, reads
+
+
+def report(label: str, timings) -> str:
+    return (f"{label:<8} mean {statistics.mean(timings) * 1000:7.3f}ms  "
+            f"p50 {statistics.median(timings) * 1000:7.3f}ms  "
+            f"p99 {sorted(timings)[int(len(timings) * 0.99)] * 1000:7.3f}ms")
+
+
+def main(transactions: int) -> None:
+    for name, pragmas in (("defaults", DEFAULTS), ("profile", model.engine_profile())):
+        with tempfile.TemporaryDirectory() as tmp:
+            writes, reads = measure(os.path.join(tmp, "bench.db"), pragmas, transactions)
+        print(f"--- {name}: {', '.join(f'{k}={v}' for k, v in pragmas.items())}")
+        print(report("commit", writes))
+        print(report("lookup", reads))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,61 @@
+"""Build time, top-k lookup latency for misspelled names and rename latency of the fuzzy name index.
+
+    python benchmarks/bench_fuzzy.py [names]
+"""
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from fuzzy import TrigramIndex
+
+QUERIES = 200
+FIRST = ["Anna", "Boris", "Olena", "Taras", "Iryna", "Mykola", "Oksana", "Dmytro", "Sofia", "Andrii",
+         "Maria", "Petro", "Yulia", "Vasyl", "Kateryna", "Ivan", "Natalia", "Serhii", "Halyna", "Roman"]
+
+
+def names(count: int, rnd: random.Random):
+    for i in range(count):
+        surname = "".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(5, 9))).capitalize()
+        yield i + 1, f"{rnd.choice(FIRST)} {surname}"
+
+
+def misspell(name: str, rnd: random.Random) -> str:
+    position = rnd.randrange(len(name))
+    kind = rnd.randrange(3)
+    if kind == 0:
+        return name[:position] + name[position + 1:]
+    if kind == 1:
+        return name[:position] + rnd.choice(string.ascii_lowercase) + name[position + 1:]
+    return name[:position] + rnd.choice(string.ascii_lowercase) + name[position:]
+
+
+def main(count: int) -> None:
+    rnd = random.Random(count)
+    rows = list(names(count, rnd))
+    start = time.perf_counter()
+    index = TrigramIndex.build(rows)
+    print(f"built index of {count} names in {time.perf_counter() - start:.2f}s")
+    timings, hits = [], 0
+    for _ in range(QUERIES):
+        _, name = rnd.choice(rows)
+        query = misspell(name, rnd)
+        start = time.perf_counter()
+        result = index.suggest(query)
+        timings.append(time.perf_counter() - start)
+        hits += name in [i for i, _ in result]
+    timings.sort()
+    print(f"suggest p50 {statistics.median(timings) * 1000:.2f}ms p99 {timings[int(QUERIES * 0.99)] * 1000:.2f}ms, "
+          f"misspelled name in top 5 for {hits * 100 // QUERIES}% of queries")
+    start = time.perf_counter()
+    for record_id, name in rnd.sample(rows, QUERIES):
+        index.add(record_id, misspell(name, rnd))
+    print(f"rename {(time.perf_counter() - start) / QUERIES * 1000:.2f}ms per name, {len(index.postings)} trigrams")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,54 @@
+"""Scaling of sort_files over processes: the same seeded tree sorted with 1, 2, 4 and 8 of them.
+
+    python benchmarks/bench_processes.py --files 200000 --breadth 16 --processes 1 2 4 8
+
+One process is the plain threaded sorter, more split the tree by top-level folder (see
+sorter.sort_sharded). Every run gets a fresh copy of the tree, only the sorting is timed.
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import dataset
+from sorter import WORKERS, sort_files_entry_point
+
+
+def run(args) -> None:
+    print(f"{'processes':>9} {'seconds':>9} {'files/s':>10} {'speedup':>8}")
+    base = None
+    for processes in args.processes:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = os.path.join(tmp, "tree")
+            dataset.build_file_tree(root, args.files, args.depth, args.breadth, duplicates=args.duplicates,
+                                    size=args.size, seed=args.seed)
+            with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+                start = time.perf_counter()
+                sort_files_entry_point(root, args.workers, dedup=args.dedup, hash_db=os.path.join(tmp, "hashes.db"),
+                                       sniff=args.sniff, processes=processes)
+                seconds = time.perf_counter() - start
+        base = base or seconds
+        print(f"{processes:>9} {seconds:>9.2f} {args.files / seconds:>10.0f} {base / seconds:>7.2f}x")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Sorter scaling over processes.")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--workers", type=int, default=WORKERS, help="threads per process")
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--breadth", type=int, default=16, help="folders per level, the top level is split")
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--size", type=int, default=1024, help="largest file size in bytes")
+    parser.add_argument("--dedup", choices=("link", "drop"))
+    parser.add_argument("--no-sniff", dest="sniff", action="store_false")
+    parser.add_argument("--seed", type=int, default=dataset.SEED)
+    return parser
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
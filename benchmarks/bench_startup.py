@@ -0,0 +1,45 @@
+"""Import cost of personal_manager up to the first prompt, measured with python -X importtime.
+
+    python benchmarks/bench_startup.py [budget in ms]
+
+Exits with status 1 when the best of several runs is over the budget, or when a module that
+should load lazily (SQLAlchemy, model, pick/curses) is imported at startup.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+BUDGET_MS = 15.0
+RUNS = 7
+LAZY_MODULES = ("sqlalchemy", "model", "address_book", "pick", "curses")
+
+
+def importtime():
+    """(cumulative microseconds of personal_manager, names of all imported modules) for one cold start"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import personal_manager"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total, modules = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        modules.add(name)
+        if name == "personal_manager":
+            total = int(cumulative)
+    return total, modules
+
+
+def main(budget_ms: float) -> int:
+    runs = [importtime() for _ in range(RUNS)]
+    best = min(total for total, _ in runs) / 1000
+    eager = sorted(name for name in runs[0][1] if name.split(".")[0] in LAZY_MODULES)
+    print(f"import personal_manager: best {best:.1f}ms of {RUNS} runs, budget {budget_ms:.1f}ms")
+    if eager:
+        print(f"modules that should load lazily were imported: {', '.join(eager)}")
+    return 0 if best <= budget_ms and not eager else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS))
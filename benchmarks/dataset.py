@@ -0,0 +1,164 @@
+"""Seeded synthetic data for the benchmarks: address-book databases and file trees to sort.
+
+    python benchmarks/dataset.py db bench.db --contacts 100000 --notes 3 --tags 2
+    python benchmarks/dataset.py tree ~/tmp/tree --files 5000 --depth 3 --breadth 4
+
+The same arguments and seed always give the same data, so timings taken on different commits
+measure the code and not the dataset.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from sqlalchemy import create_engine, event
+import model
+import search
+from classifier import CATEGORIES
+from model import Addresses, Base, Emails, Notes, Phones, Records, Tags, birthday_key, note_tags
+
+SEED = 1
+BATCH = 10000
+FIRST = ["Anna", "Boris", "Olena", "Taras", "Iryna", "Mykola", "Oksana", "Dmytro", "Sofia", "Andrii",
+         "Maria", "Petro", "Yulia", "Vasyl", "Kateryna", "Ivan", "Natalia", "Serhii", "Halyna", "Roman"]
+WORDS = ["call", "meeting", "invoice", "birthday", "gift", "project", "review", "trip", "doctor", "lunch",
+         "report", "contract", "payment", "school", "holiday", "repair", "order", "delivery", "team", "plan"]
+# share of every category in a generated tree, "other" files have extensions the sorter does not know
+MIX = {"images": 30, "documents": 30, "audio": 10, "video": 10, "archives": 10, "other": 10}
+OTHER_EXTENSIONS = ("py", "md", "csv", "bin", "json")
+
+
+def _word(rnd: random.Random, low: int = 5, high: int = 9) -> str:
+    return "".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(low, high)))
+
+
+def _sentence(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+
+def build_address_book(path: str, contacts: int, phones: int = 1, emails: int = 1, addresses: int = 1,
+                       notes: int = 2, tags: int = 2, tag_pool: int = 200, seed: int = SEED) -> Dict[str, int]:
+    """Creates the database at `path` with the full schema, the search index and the tag triggers.
+
+    Every contact gets `phones`, `emails`, `addresses` and `notes` rows, every note up to `tags`
+    tags drawn from `tag_pool` titles with a long-tailed popularity. Returns the row counts.
+    """
+    rnd = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", model.set_sqlite_pragma)
+    Base.metadata.create_all(engine)
+    pool = sorted({_word(rnd, 3, 8) for _ in range(tag_pool * 2)})[:tag_pool]
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    tables = {"records": Records.__table__, "phones": Phones.__table__, "emails": Emails.__table__,
+              "addresses": Addresses.__table__, "notes": Notes.__table__, "note_tags": note_tags}
+    rows, counts = {i: [] for i in tables}, dict.fromkeys(tables, 0)
+    names, start = set(), date(1950, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(Tags.__table__.insert(), [{"id": i + 1, "title": title} for i, title in enumerate(pool)])
+
+        def flush() -> None:
+            for table, batch in rows.items():
+                if batch:
+                    connection.execute(tables[table].insert(), batch)
+                    counts[table] += len(batch)
+                    batch.clear()
+
+        note_id = 0
+        for record_id in range(1, contacts + 1):
+            name = f"{rnd.choice(FIRST)} {_word(rnd)}".capitalize()
+            while name.lower() in names:
+                name = f"{name}{rnd.randrange(10)}"
+            names.add(name.lower())
+            birthday = start + timedelta(days=rnd.randrange(365 * 60))
+            rows["records"].append({"id": record_id, "name": name, "birthday": birthday,
+                                    "birthday_day": birthday_key(birthday)})
+            rows["phones"] += [{"number": f"+380{rnd.randrange(10 ** 9):09d}", "records_id": record_id}
+                               for _ in range(phones)]
+            rows["emails"] += [{"title": f"{_word(rnd)}@{rnd.choice(WORDS)}.com", "records_id": record_id}
+                               for _ in range(emails)]
+            rows["addresses"] += [{"title": f"{_word(rnd).capitalize()} street {rnd.randint(1, 200)}",
+                                   "records_id": record_id} for _ in range(addresses)]
+            for _ in range(notes):
+                note_id += 1
+                rows["notes"].append({"id": note_id, "title": _sentence(rnd, rnd.randint(2, 8)),
+                                      "records_id": record_id})
+                tag_ids = {rnd.choices(range(1, len(pool) + 1), weights)[0] for _ in range(rnd.randint(0, tags))}
+                rows["note_tags"] += [{"note_id": note_id, "tag_id": i} for i in tag_ids]
+            if len(rows["records"]) >= BATCH:
+                flush()
+        flush()
+        # filling the search index in one pass is much faster than its per-row triggers
+        search.install(connection)
+    engine.dispose()
+    return counts
+
+
+def build_file_tree(root: str, files: int, depth: int = 2, breadth: int = 3, mix: Optional[Dict[str, int]] = None,
+                    duplicates: float = 0.1, size: int = 4096, seed: int = SEED) -> int:
+    """Creates `files` files spread over a tree of `breadth` folders per level, `depth` levels deep.
+
+    Extensions follow `mix` over the sorter CATEGORIES (upper and lower case), `duplicates` is the
+    share of files that repeat the content of an earlier one. Returns the number of folders.
+    """
+    rnd = random.Random(seed)
+    mix = mix or MIX
+    folders, level = [root], [root]
+    for _ in range(depth):
+        level = [os.path.join(parent, _word(rnd, 4, 8)) for parent in level for _ in range(breadth)]
+        folders += level
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+    categories, weights = list(mix), list(mix.values())
+    contents = []
+    for i in range(files):
+        category = rnd.choices(categories, weights)[0]
+        extension = rnd.choice(OTHER_EXTENSIONS if category == "other" else CATEGORIES[category])
+        extension = extension.lower() if rnd.random() < 0.8 else extension.upper()
+        if contents and rnd.random() < duplicates:
+            content = rnd.choice(contents)
+        else:
+            content = rnd.randbytes(rnd.randint(size // 4, size))
+            contents.append(content)
+        with open(os.path.join(rnd.choice(folders), f"{_word(rnd)}_{i}.{extension}"), "wb") as file:
+            file.write(content)
+    return len(folders)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate benchmark data.")
+    parser.add_argument("--seed", type=int, default=SEED)
+    commands = parser.add_subparsers(dest="kind", required=True)
+    db = commands.add_parser("db", help="address-book database")
+    db.add_argument("path")
+    db.add_argument("--contacts", type=int, default=10000)
+    for option in ("phones", "emails", "addresses"):
+        db.add_argument(f"--{option}", type=int, default=1, help="per contact")
+    db.add_argument("--notes", type=int, default=2, help="per contact")
+    db.add_argument("--tags", type=int, default=2, help="most tags per note")
+    db.add_argument("--tag-pool", type=int, default=200, help="distinct tag titles")
+    tree = commands.add_parser("tree", help="folder of files to sort")
+    tree.add_argument("path")
+    tree.add_argument("--files", type=int, default=2000)
+    tree.add_argument("--depth", type=int, default=2)
+    tree.add_argument("--breadth", type=int, default=3)
+    tree.add_argument("--duplicates", type=float, default=0.1)
+    tree.add_argument("--size", type=int, default=4096, help="largest file size in bytes")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    if args.kind == "db":
+        if os.path.exists(args.path):
+            sys.exit(f"{args.path} already exists")
+        print(build_address_book(args.path, args.contacts, args.phones, args.emails, args.addresses, args.notes,
+                                 args.tags, args.tag_pool, args.seed))
+    else:
+        folders = build_file_tree(args.path, args.files, args.depth, args.breadth, None, args.duplicates, args.size,
+                                  args.seed)
+        print(f"{args.files} files in {folders} folders")
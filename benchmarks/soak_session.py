@@ -0,0 +1,79 @@
+"""Runs many read and write commands through unit_of_work() and checks that RSS stays flat.
+
+    python benchmarks/soak_session.py [commands] [threads]
+
+Uses a scratch database in a temporary folder. Exits with status 1 when the resident set
+grows by more than GROWTH_LIMIT_MB between the end of the warm-up and the end of the run.
+"""
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import model
+import operations
+from model import Base, unit_of_work
+
+CONTACTS = 200
+WARMUP = 0.1
+GROWTH_LIMIT_MB = 5.0
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # peak instead of current size outside Linux, still catches steady growth
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def command(i: int) -> None:
+    with unit_of_work() as session:
+        kind = i % 4
+        if kind == 0:
+            operations.find_contact(session, f"Contact{i % CONTACTS}")
+        elif kind == 1:
+            operations.show_contacts(session, limit=20)
+        elif kind == 2:
+            operations.holidays_period(session, 30)
+        else:
+            operations.add_note(session, f"Contact{i % CONTACTS}", f"note {i}")
+
+
+def worker(start: int, stop: int, step: int) -> None:
+    for i in range(start, stop, step):
+        command(i)
+
+
+def main(commands: int, threads: int) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        model.DB_URL = f"sqlite:///{os.path.join(tmp, 'soak.db')}"
+        Base.metadata.create_all(model.get_engine())
+        with unit_of_work() as session:
+            for i in range(CONTACTS):
+                operations.add_contact(session, f"Contact{i}", "01.02.1990", "+380501234567")
+        warmup = int(commands * WARMUP)
+        worker(0, warmup, 1)
+        baseline = rss_mb()
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(warmup + n, commands, threads)) for n in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        growth = rss_mb() - baseline
+        model.get_engine().dispose()
+    print(f"{commands - warmup} commands on {threads} thread(s) in {elapsed:.1f}s "
+          f"({(commands - warmup) / elapsed:.0f}/s), RSS {baseline:.1f}MB -> {baseline + growth:.1f}MB")
+    return 0 if growth <= GROWTH_LIMIT_MB else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 1))
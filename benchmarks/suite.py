@@ -0,0 +1,214 @@
+"""Times every AddressBook command and a full sort_files run on seeded synthetic data.
+
+    python benchmarks/suite.py run --contacts 20000 --repeat 20 --output head.json
+    python benchmarks/suite.py compare base.json head.json --threshold 0.15
+
+`run` builds the data with benchmarks/dataset.py in a temporary folder, answers the prompts and
+menus of every command with stubs (menus over queries still run their first-page query) and
+writes JSON results. `compare` prints the change of every command between two result files and
+exits with 1 when one of them got slower than the threshold allows.
+"""
+import argparse
+import builtins
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import dataset
+
+REPEAT = 20
+THRESHOLD = 0.15
+MIN_DELTA_MS = 1.0
+
+
+class Case(NamedTuple):
+    method: str
+    # answers(i) gives the input() answers of run i; it is called before the timer starts
+    answers: Callable[[int], List[str]]
+    menus: tuple = ()
+    heavy: bool = False
+
+
+def first_row(query, title, indicator="=>"):
+    """pick_row stand-in that runs the picker's first-page query and selects its first row"""
+    from picker import QueryPicker
+    picker = QueryPicker(query, title, indicator)
+    picker.load()
+    return picker.selected()
+
+
+def cases(names: List[str], tags: List[str], work: str, files: Dict) -> Dict[str, Case]:
+    """Commands in the order they run, the deleting ones last so the others see the full data set"""
+    contact = lambda i: names[i % len(names)]
+    victim = lambda i: names[-1 - i % len(names)]
+
+    def import_file(i: int) -> List[str]:
+        path = os.path.join(work, f"import_{i}.csv")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("name,birthday,phones,emails,addresses,notes\n")
+            file.writelines(f"Imported {i} {j},01.02.1990,+380501234567,imp{j}@mail.com,Street {j},note\n"
+                            for j in range(files["import_rows"]))
+        return [path, ""]
+
+    def sort_tree(i: int) -> List[str]:
+        path = os.path.join(work, f"tree_{i}")
+        dataset.build_file_tree(path, files["files"], files["depth"], files["breadth"], seed=files["seed"])
+        return [f"{path} --dedup link --hash-db {os.path.join(work, 'hashes.db')}"]
+
+    typo = lambda name: name[:-2] + name[-1]
+    return {
+        "find_contact": Case("find_contact", lambda i: [contact(i)]),
+        "find_contact_typo": Case("find_contact", lambda i: [typo(contact(i))], (0,)),
+        "print_notes": Case("print_notes", lambda i: [contact(i)]),
+        "holidays_period": Case("holidays_period", lambda i: ["30"]),
+        "find_sort_note": Case("find_sort_note", lambda i: [tags[i % 3]]),
+        "find_notes_all": Case("find_notes_by_tags", lambda i: [f"{tags[0]};{tags[1 + i % 3]}", "all"]),
+        "find_notes_any": Case("find_notes_by_tags", lambda i: [f"{tags[-1]};{tags[-2 - i % 3]}", "any"]),
+        "tag_cloud": Case("tag_cloud", lambda i: []),
+        "search": Case("search", lambda i: [contact(i).split()[-1][:4]]),
+        "show_contacts": Case("show_contacts", lambda i: [], heavy=True),
+        "export_contacts": Case("export_contacts", lambda i: [os.path.join(work, f"export_{i}.jsonl")], heavy=True),
+        "add_record": Case("add_record", lambda i: [f"Bench contact {i}", "+380501234567", "01.02.1990",
+                                                    "Street 1", "bench@mail.com", "bench note"]),
+        "add_note": Case("add_note", lambda i: [contact(i), f"bench note {i}"]),
+        "add_tags": Case("add_tags", lambda i: [contact(i), f"bench;{tags[i % len(tags)]}"]),
+        # edit_record opens the "Edit notes" menu entry (5), then "FINISH EDITING" (7)
+        "edit_record": Case("edit_record", lambda i: [f"edited note {i}"], (5, 7)),
+        "del_note": Case("del_note", lambda i: [contact(i)]),
+        "import_contacts": Case("import_contacts", import_file, heavy=True),
+        "sort_files": Case("sort_files", sort_tree, heavy=True),
+        "del_contact": Case("del_contact", lambda i: [victim(i)]),
+    }
+
+
+def timings_of(values: List[float]) -> Dict[str, float]:
+    values = sorted(i * 1000 for i in values)
+    return {"runs": len(values), "mean_ms": statistics.mean(values), "p50_ms": statistics.median(values),
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))], "min_ms": values[0]}
+
+
+def run(args) -> Dict:
+    work = tempfile.mkdtemp(prefix="address_book_bench_")
+    try:
+        db_path = os.path.join(work, "bench.db")
+        counts = dataset.build_address_book(db_path, args.contacts, args.phones, args.emails, args.addresses,
+                                            args.notes, args.tags, args.tag_pool, args.seed)
+        # model creates its engine on first use, so pointing DB_URL at the bench database is enough
+        import model
+        model.DB_URL = f"sqlite:///{db_path}"
+        import address_book
+        from model import Records, Tags, unit_of_work
+        with unit_of_work() as session:
+            names = [i for i, in session.query(Records.name).order_by(Records.id).limit(args.repeat * 2)]
+            tags = [i for i, in session.query(Tags.title).order_by(Tags.usage_count.desc())]
+        files = {"files": args.files, "depth": args.depth, "breadth": args.breadth, "seed": args.seed,
+                 "import_rows": args.import_rows}
+        book, results = address_book.AddressBook(), {}
+        for name, case in cases(names, tags, work, files).items():
+            if args.only and name not in args.only:
+                continue
+            runs = max(1, args.repeat // 10) if case.heavy else args.repeat
+            values = []
+            for i in range(runs):
+                answers, menus = iter(case.answers(i)), iter(case.menus)
+
+                def menu(options, *_, **__):
+                    index = next(menus)
+                    return options[index], index
+
+                with stubbed(address_book, answers, menu), open(os.devnull, "w") as null, \
+                        contextlib.redirect_stdout(null):
+                    start = time.perf_counter()
+                    with unit_of_work():
+                        getattr(book, case.method)()
+                    values.append(time.perf_counter() - start)
+            results[name] = timings_of(values)
+            print(f"{name:<20} p50 {results[name]['p50_ms']:9.2f}ms  p95 {results[name]['p95_ms']:9.2f}ms",
+                  file=sys.stderr)
+        model.get_engine().dispose()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return {"meta": {"created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                     "platform": platform.platform(), "repeat": args.repeat, "seed": args.seed, "rows": counts,
+                     "files": args.files, "depth": args.depth, "breadth": args.breadth},
+            "results": results}
+
+
+@contextlib.contextmanager
+def stubbed(module, answers, menu):
+    """Replaces input(), pick() and pick_row() while one command runs"""
+    saved = builtins.input, module.pick, module.pick_row
+    builtins.input = lambda prompt="": next(answers)
+    module.pick, module.pick_row = menu, first_row
+    try:
+        yield
+    finally:
+        builtins.input, module.pick, module.pick_row = saved
+
+
+def compare(base: Dict, head: Dict, metric: str, threshold: float, min_delta: float) -> bool:
+    """Prints every command's change, False when one is slower by more than threshold and min_delta"""
+    ok = True
+    print(f"{'command':<20} {'base':>10} {'head':>10} {'change':>8}")
+    for name, result in head["results"].items():
+        if name not in base["results"]:
+            print(f"{name:<20} {'-':>10} {result[metric]:10.2f} {'new':>8}")
+            continue
+        old, new = base["results"][name][metric], result[metric]
+        change = (new - old) / old if old else 0.0
+        regressed = change > threshold and new - old > min_delta
+        ok = ok and not regressed
+        print(f"{name:<20} {old:10.2f} {new:10.2f} {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Address book and sorter benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("run", help="run the benchmarks and write JSON results")
+    bench.add_argument("--output", help="results file, stdout by default")
+    bench.add_argument("--repeat", type=int, default=REPEAT, help="runs per command, a tenth for the heavy ones")
+    bench.add_argument("--only", nargs="+", help="names of the commands to run")
+    bench.add_argument("--seed", type=int, default=dataset.SEED)
+    bench.add_argument("--contacts", type=int, default=10000)
+    for option in ("phones", "emails", "addresses"):
+        bench.add_argument(f"--{option}", type=int, default=1, help="per contact")
+    bench.add_argument("--notes", type=int, default=2, help="per contact")
+    bench.add_argument("--tags", type=int, default=2, help="most tags per note")
+    bench.add_argument("--tag-pool", type=int, default=200, help="distinct tag titles")
+    bench.add_argument("--import-rows", type=int, default=1000, help="rows of every imported file")
+    bench.add_argument("--files", type=int, default=2000, help="files in the tree to sort")
+    bench.add_argument("--depth", type=int, default=2)
+    bench.add_argument("--breadth", type=int, default=3)
+    check = commands.add_parser("compare", help="compare two result files")
+    check.add_argument("base")
+    check.add_argument("head")
+    check.add_argument("--metric", default="p50_ms", choices=("p50_ms", "mean_ms", "p95_ms", "min_ms"))
+    check.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown, 0.15 is 15%%")
+    check.add_argument("--min-delta", type=float, default=MIN_DELTA_MS,
+                       help="smaller slowdowns in ms are noise and never fail")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    if args.command == "compare":
+        with open(args.base) as base, open(args.head) as head:
+            sys.exit(0 if compare(json.load(base), json.load(head), args.metric, args.threshold, args.min_delta)
+                     else 1)
+    output = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
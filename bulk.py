@@ -0,0 +1,275 @@
+import csv
+import json
+import os
+import re
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+import fuzzy
+from model import Addresses, Emails, Notes, Phones, Records, birthday_key
+from queries import iter_contacts
+from validators import InvalidBirthday, InvalidEmailAddress, InvalidPhoneNumber, \
+    birthday_text, birthday_valid, email_valid, phone_valid
+
+FORMATS = ("csv", "jsonl", "vcf")
+FIELDS = ("name", "birthday", "phones", "emails", "addresses", "notes")
+LIST_FIELDS = ("phones", "emails", "addresses", "notes")
+SEPARATOR = ";"
+# a backslash escape of vCard text values, and a ";" between components that is not escaped
+VCARD_ESCAPE = re.compile(r"\\(.)")
+VCARD_COMPONENT = re.compile(r"(?<!\\)((?:\\\\)*);")
+BATCH_SIZE = 1000
+# names per IN (...) lookup, below SQLite's bound parameter limit of 999 before 3.32
+NAMES_PER_QUERY = 900
+
+
+class InvalidRow(Exception):
+    """Exception for an imported row that does not pass validation"""
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"vcard": "vcf", "json": "jsonl", "ndjson": "jsonl"}.get(extension, extension)
+
+
+def split_values(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(i).strip() for i in value if str(i).strip()]
+    return [i.strip() for i in (value or "").split(SEPARATOR) if i.strip()]
+
+
+def _csv_list(value):
+    """A list field as export writes it, a JSON array, or ";"-separated text as typed by hand"""
+    if value and value.lstrip().startswith("["):
+        try:
+            items = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(items, list):
+            return items
+    return value
+
+
+def read_csv(f) -> Iterator[Dict]:
+    for row in csv.DictReader(f):
+        for field in LIST_FIELDS:
+            row[field] = _csv_list(row.get(field))
+        yield row
+
+
+def read_jsonl(f) -> Iterator[Dict]:
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _vcard_lines(f) -> Iterator[str]:
+    """Unfolds continuation lines, which start with a space or a tab"""
+    current = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _vcard_unescape(value: str) -> str:
+    return VCARD_ESCAPE.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def _vcard_components(value: str) -> List[str]:
+    """The ";"-separated components of a structured value like ADR, unescaped"""
+    return [_vcard_unescape(i) for i in VCARD_COMPONENT.sub(lambda match: match.group(1) + "\0", value).split("\0")]
+
+
+def read_vcf(f) -> Iterator[Dict]:
+    row = None
+    for line in _vcard_lines(f):
+        key, _, value = line.partition(":")
+        key = key.split(";")[0].upper()
+        if key == "BEGIN":
+            row = {"name": "", "birthday": "", "phones": [], "emails": [], "addresses": [], "notes": []}
+        elif key == "END" and row is not None:
+            yield row
+            row = None
+        elif row is None:
+            continue
+        elif key == "FN":
+            row["name"] = _vcard_unescape(value)
+        elif key == "BDAY":
+            digits = value.replace("-", "")[:8]
+            try:
+                row["birthday"] = datetime.strptime(digits, "%Y%m%d").strftime("%d.%m.%Y")
+            except ValueError:
+                row["birthday"] = value
+        elif key == "TEL":
+            row["phones"].append(value)
+        elif key == "EMAIL":
+            row["emails"].append(value)
+        elif key == "ADR":
+            row["addresses"].append(", ".join(i for i in _vcard_components(value) if i))
+        elif key == "NOTE":
+            row["notes"].append(_vcard_unescape(value))
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "vcf": read_vcf}
+
+
+def validate(row: Dict) -> Dict:
+    """Row with the same rules as interactive input, raising InvalidRow with the reason.
+    The birthday comes back as a date and the phones in E.164 form."""
+    contact = {"name": str(row.get("name") or "").strip().capitalize(),
+               "birthday": str(row.get("birthday") or "").strip()}
+    for field in LIST_FIELDS:
+        contact[field] = split_values(row.get(field))
+    if not contact["name"]:
+        raise InvalidRow("The name is empty")
+    try:
+        contact["birthday"] = birthday_valid(contact["birthday"]) if contact["birthday"] else None
+        contact["phones"] = [phone_valid(i) for i in contact["phones"]]
+        for email in contact["emails"]:
+            email_valid(email)
+    except InvalidBirthday:
+        raise InvalidRow(f"The birthday {contact['birthday']} is invalid")
+    except InvalidPhoneNumber:
+        raise InvalidRow(f"The phone number {contact['phones']} is invalid")
+    except InvalidEmailAddress:
+        raise InvalidRow(f"The email {contact['emails']} is invalid")
+    return contact
+
+
+def _batches(rows: Iterable, size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def split_duplicates(session, contacts: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Separates contacts whose name is already taken, ignoring case like uq_records_name_nocase"""
+    names = [contact["name"] for contact in contacts]
+    taken = set()
+    for chunk in _batches(names, NAMES_PER_QUERY):
+        taken.update(name.lower() for name, in session.query(Records.name)
+                     .filter(Records.name.collate("NOCASE").in_(chunk)))
+    fresh, duplicates = [], []
+    for contact in contacts:
+        key = contact["name"].lower()
+        (duplicates if key in taken else fresh).append(contact)
+        taken.add(key)
+    return fresh, duplicates
+
+
+def insert_batch(session, contacts: List[Dict]) -> None:
+    """Inserts contacts and their child rows with one executemany per table, in one transaction"""
+    if not contacts:
+        return
+    records = [{"name": contact["name"], "birthday": contact["birthday"],
+                "birthday_day": birthday_key(contact["birthday"])} for contact in contacts]
+    # the ids come back from the inserts, other writers may add contacts at the same time
+    table = Records.__table__
+    record_ids = session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                                 records).scalars().all()
+    children = {Phones: [], Emails: [], Addresses: [], Notes: []}
+    for record_id, contact in zip(record_ids, contacts):
+        children[Phones] += [{"number": i, "records_id": record_id} for i in contact["phones"]]
+        children[Emails] += [{"title": i, "records_id": record_id} for i in contact["emails"]]
+        children[Addresses] += [{"title": i, "records_id": record_id} for i in contact["addresses"]]
+        children[Notes] += [{"title": i, "records_id": record_id} for i in contact["notes"]]
+    fuzzy.track_inserted(session, [(record_id, i["name"]) for record_id, i in zip(record_ids, records)])
+    for model, rows in children.items():
+        if rows:
+            session.execute(model.__table__.insert(), rows)
+    session.commit()
+
+
+def import_contacts(session, path: str, fmt: str = None, batch_size: int = BATCH_SIZE,
+                    rejects_path: str = None) -> Tuple[int, int, float]:
+    """Streams a file into the address book, returns (imported, rejected, seconds)"""
+    fmt = fmt or detect_format(path)
+    rejects_path = rejects_path or f"{path}.rejects.jsonl"
+    imported = rejected = 0
+    start = time.perf_counter()
+    with open(path, encoding="utf-8", newline="") as f, open(rejects_path, "w", encoding="utf-8") as rejects:
+
+        def reject(number, error: str, row: Dict) -> None:
+            nonlocal rejected
+            rejected += 1
+            rejects.write(json.dumps({"row": number, "error": error, "data": row}, ensure_ascii=False, default=birthday_text)
+                          + "\n")
+
+        def valid_rows() -> Iterator[Dict]:
+            for number, row in enumerate(READERS[fmt](f), 1):
+                try:
+                    yield validate(row)
+                except InvalidRow as e:
+                    reject(number, str(e), row)
+
+        for batch in _batches(valid_rows(), batch_size):
+            try:
+                batch, duplicates = split_duplicates(session, batch)
+                insert_batch(session, batch)
+            except Exception:
+                session.rollback()
+                raise
+            for contact in duplicates:
+                reject(None, f"The username {contact['name']} is already registered", contact)
+            imported += len(batch)
+    if not rejected:
+        os.remove(rejects_path)
+    return imported, rejected, time.perf_counter() - start
+
+
+def _vcard_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace(",", "\\,").replace(";", "\\;")
+
+
+def write_vcf(f, contact: Dict) -> None:
+    lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{_vcard_escape(contact['name'])}"]
+    if contact["birthday"]:
+        try:
+            lines.append(f"BDAY:{datetime.strptime(contact['birthday'], '%d.%m.%Y').strftime('%Y-%m-%d')}")
+        except ValueError:
+            pass
+    lines += [f"TEL:{i}" for i in contact["phones"]]
+    lines += [f"EMAIL:{i}" for i in contact["emails"]]
+    lines += [f"ADR:;;{_vcard_escape(i)};;;;" for i in contact["addresses"]]
+    lines += [f"NOTE:{_vcard_escape(i)}" for i in contact["notes"]]
+    lines.append("END:VCARD")
+    f.write("\r\n".join(lines) + "\r\n")
+
+
+def export_contacts(session, path: str, fmt: str = None) -> int:
+    """Writes every contact page by page, so memory stays flat whatever the book size"""
+    fmt = fmt or detect_format(path)
+    exported = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        for page in iter_contacts(session):
+            for record in page:
+                contact = {"name": record.name, "birthday": birthday_text(record.birthday),
+                           "phones": [i.number for i in record.phones],
+                           "emails": [i.title for i in record.emails],
+                           "addresses": [i.title for i in record.addresses],
+                           "notes": [i.title for i in record.notes]}
+                if fmt == "csv":
+                    # lists go as JSON arrays, a ";" inside a note or an address stays part of it
+                    writer.writerow({k: json.dumps(v, ensure_ascii=False) if k in LIST_FIELDS else v
+                                     for k, v in contact.items()})
+                elif fmt == "jsonl":
+                    f.write(json.dumps(contact, ensure_ascii=False) + "\n")
+                else:
+                    write_vcf(f, contact)
+                exported += 1
+            session.expunge_all()
+    return exported
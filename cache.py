@@ -0,0 +1,127 @@
+"""Read-through LRU cache of contact graphs for the interactive address book.
+
+A contact is read once with all of its collections and then served by id or by name until a write
+touches it. Every session reports the records its flushes change, and the cached graphs of those
+records are dropped right away; a rollback drops the graphs read in the rolled back session, whose
+state it expires. Bulk UPDATE and DELETE statements do not tell which records they changed, so
+they empty the caches. ADDRESS_BOOK_CACHE_SIZE sets how many contacts are kept, the stats command
+shows the hits, misses and evictions to size it by.
+"""
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from itertools import chain
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from model import Addresses, Emails, Notes, Phones, Records
+from queries import load_contact
+
+CACHE_SIZE = 256
+CACHE_SIZE_ENV = "ADDRESS_BOOK_CACHE_SIZE"
+CHILDREN = (Phones, Emails, Addresses, Notes)
+CACHED = (Records,) + CHILDREN
+
+
+class ContactCache:
+    """Up to `size` contact graphs by record id, the least recently used one goes first"""
+
+    def __init__(self, size: int = None):
+        self.size = max(1, size or int(os.environ.get(CACHE_SIZE_ENV, CACHE_SIZE)))
+        # record id -> (name, contact); the name is kept apart, the contact may be expired by a rollback
+        self.contacts: "OrderedDict[int, Tuple[str, Records]]" = OrderedDict()
+        self.ids: Dict[str, int] = {}
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, session, name: str = None, record_id: int = None) -> Optional[Records]:
+        """Contact by id or name, read from the database on a miss, or None"""
+        with self.lock:
+            key = self.ids.get(name) if record_id is None else record_id
+            found = self.contacts.get(key)
+            if found is not None:
+                self.contacts.move_to_end(key)
+                self.hits += 1
+                return found[1]
+            self.misses += 1
+        contact = load_contact(session, name=name, record_id=record_id)
+        if contact is not None:
+            self.put(contact)
+        return contact
+
+    def put(self, contact: Records) -> None:
+        with self.lock:
+            self._drop(contact.id)
+            self.contacts[contact.id] = (contact.name, contact)
+            self.ids[contact.name] = contact.id
+            while len(self.contacts) > self.size:
+                self._drop(next(iter(self.contacts)))
+                self.evictions += 1
+
+    def _drop(self, record_id: int) -> None:
+        name, _ = self.contacts.pop(record_id, (None, None))
+        if self.ids.get(name) == record_id:
+            del self.ids[name]
+
+    def invalidate(self, record_ids: Iterable[int]) -> None:
+        with self.lock:
+            for record_id in record_ids:
+                self._drop(record_id)
+
+    def invalidate_session(self, session) -> None:
+        """Drops the contacts still attached to `session`"""
+        with self.lock:
+            for record_id in [i for i, (_, contact) in self.contacts.items() if object_session(contact) is session]:
+                self._drop(record_id)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.contacts.clear()
+            self.ids.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"size": len(self.contacts), "capacity": self.size, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+_caches: "weakref.WeakSet[ContactCache]" = weakref.WeakSet()
+
+
+def _changed_records(session) -> set:
+    record_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Records):
+            record_ids.add(obj.id)
+        elif isinstance(obj, CHILDREN):
+            # a row moved to another contact changes both of them
+            record_ids.add(obj.records_id)
+            record_ids.update(inspect(obj).attrs.records_id.history.deleted)
+    record_ids.discard(None)
+    return record_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed(session, flush_context) -> None:
+    if _caches:
+        record_ids = _changed_records(session)
+        if record_ids:
+            for cache in list(_caches):
+                cache.invalidate(record_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _invalidate_rolled_back(session) -> None:
+    for cache in list(_caches):
+        cache.invalidate_session(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk(orm_execute_state) -> None:
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and _caches:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, CACHED):
+            for cache in list(_caches):
+                cache.clear()
@@ -0,0 +1,183 @@
+"""Sorter categories by file extension, with a look at the content for files the table does not know.
+
+Known extensions are resolved through a frozen extension -> category table. A file without one
+has its first SNIFF_SIZE bytes matched against magic numbers, which give an extension that the
+table then maps to a category; HEIC and AVIF images are only sorted when a category lists them.
+Sniffed extensions are cached per (device, inode) together with mtime and size, so a file is read
+once until it changes.
+
+Categories come from CATEGORIES, updated by the [categories] section of an INI file:
+
+    [categories]
+    images = jpeg png jpg svg gif heic
+    books = epub mobi fb2
+    archives =
+
+where an empty value drops a category.
+"""
+import os
+import re
+import sqlite3
+from configparser import ConfigParser
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+from dedup import HASH_DB
+
+CATEGORIES = {'images': ('JPEG', 'PNG', 'JPG', 'SVG'), 'documents': ('DOC', 'DOCX', 'TXT', 'PDF', 'XLSX', 'PPTX'),
+              'audio': ('MP3', 'OGG', 'WAV', 'AMR'), 'video': ('AVI', 'MP4', 'MOV', 'MKV'), 'archives': ('ZIP', 'GZ', 'TAR')}
+CATEGORIES_ENV = "SORTER_CATEGORIES"
+SNIFF_SIZE = 512
+# (offset, magic bytes, extension); the first match wins, so more specific entries come first
+SIGNATURES = (
+    (0, b"\xff\xd8\xff", "JPG"),
+    (0, b"\x89PNG\r\n\x1a\n", "PNG"),
+    (0, b"GIF87a", "GIF"),
+    (0, b"GIF89a", "GIF"),
+    (0, b"%PDF-", "PDF"),
+    (0, b"PK\x03\x04", "ZIP"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "DOC"),
+    (0, b"\x1f\x8b", "GZ"),
+    (257, b"ustar", "TAR"),
+    (8, b"AVI ", "AVI"),
+    (8, b"WAVE", "WAV"),
+    (0, b"\x1aE\xdf\xa3", "MKV"),
+    (0, b"OggS", "OGG"),
+    (0, b"#!AMR", "AMR"),
+    (0, b"ID3", "MP3"),
+    (0, b"\xff\xfb", "MP3"),
+    (0, b"\xff\xf3", "MP3"),
+    (0, b"\xff\xf2", "MP3"),
+)
+# ISO base media files (MP4, QuickTime, HEIF) carry "ftyp" at offset 4 and their major brand at 8;
+# a brand not listed here, say a camera's own, leaves the file unclassified
+BRANDS = {b"isom": "MP4", b"iso2": "MP4", b"mp41": "MP4", b"mp42": "MP4", b"avc1": "MP4", b"M4V ": "MP4",
+          b"qt  ": "MOV", b"M4A ": "M4A", b"heic": "HEIC", b"heix": "HEIC", b"mif1": "HEIC", b"msf1": "HEIC",
+          b"avif": "AVIF", b"avis": "AVIF"}
+# <svg as the first element, after an optional XML declaration, comments and a doctype
+SVG = re.compile(rb"(?:\xef\xbb\xbf)?\s*(?:<\?xml[^>]*\?>\s*)?(?:(?:<!--.*?-->|<!DOCTYPE[^>\[]*(?:\[.*?\])?\s*>)\s*)*"
+                 rb"<svg[\s>/]", re.S)
+# a user table may only list the other spelling of a sniffed extension
+ALIASES = {"JPG": "JPEG", "JPEG": "JPG", "GZ": "GZIP", "MOV": "QT"}
+# Office documents are zip files whose first entries are the package parts
+OFFICE_PARTS = ((b"word/", "DOCX"), (b"xl/", "XLSX"), (b"ppt/", "PPTX"))
+
+
+def sniff(header: bytes) -> Optional[str]:
+    """Extension of a file judging by its first bytes, None when no signature matches"""
+    if header.startswith(b"ftyp", 4):
+        return BRANDS.get(header[8:12])
+    for offset, magic, extension in SIGNATURES:
+        if header.startswith(magic, offset):
+            if extension == "ZIP":
+                # the local file header keeps the name of the first entry at offset 30
+                package = header.startswith((b"[Content_Types].xml", b"_rels/"), 30)
+                for part, office in OFFICE_PARTS:
+                    if header.startswith(part, 30) or package and part in header:
+                        return office
+                if package:
+                    # the parts are past the header, an Office package is a document all the same
+                    return "DOCX"
+            return extension
+    if SVG.match(header):
+        return "SVG"
+    return None
+
+
+def load_categories(path: str = None, defaults: Mapping[str, Tuple[str, ...]] = CATEGORIES) -> Dict[str, tuple]:
+    """The default categories updated from the [categories] section of `path` or $SORTER_CATEGORIES"""
+    categories = dict(defaults)
+    path = path or os.environ.get(CATEGORIES_ENV)
+    if path:
+        parser = ConfigParser()
+        if not parser.read(path, encoding="utf-8"):
+            raise FileNotFoundError(path)
+        if parser.has_section("categories"):
+            for name, value in parser.items("categories"):
+                extensions = tuple(i.strip(".").upper() for i in value.replace(",", " ").split())
+                if extensions:
+                    categories[name] = extensions
+                else:
+                    categories.pop(name, None)
+    return categories
+
+
+class TypeCache:
+    """Sniffed extensions per (device, inode), trusted while size and mtime are unchanged"""
+
+    def __init__(self, path: str = HASH_DB):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS file_types (device INTEGER, inode INTEGER, "
+                                "size INTEGER, mtime_ns INTEGER, extension TEXT, "
+                                "PRIMARY KEY (device, inode)) WITHOUT ROWID")
+        self._pending: Dict[Tuple[int, int], tuple] = {}
+
+    def get(self, stat: os.stat_result) -> Tuple[bool, Optional[str]]:
+        """(found, extension), a file known to match no signature is found with extension None"""
+        key = (stat.st_dev, stat.st_ino)
+        row = self._pending.get(key)
+        if row is None:
+            row = self.connection.execute("SELECT device, inode, size, mtime_ns, extension FROM file_types "
+                                          "WHERE device = ? AND inode = ?", key).fetchone()
+        if row and row[2] == stat.st_size and row[3] == stat.st_mtime_ns:
+            return True, row[4]
+        return False, None
+
+    def put(self, stat: os.stat_result, extension: Optional[str]) -> None:
+        self._pending[(stat.st_dev, stat.st_ino)] = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns,
+                                                     extension)
+
+    def commit(self) -> None:
+        self.connection.executemany("INSERT OR REPLACE INTO file_types VALUES (?, ?, ?, ?, ?)",
+                                    self._pending.values())
+        self.connection.commit()
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.commit()
+        self.connection.close()
+
+
+class Classifier:
+
+    def __init__(self, categories: Mapping[str, Iterable[str]] = CATEGORIES, sniff: bool = True,
+                 cache_path: str = HASH_DB):
+        self.categories = MappingProxyType({name: tuple(i.upper() for i in extensions)
+                                            for name, extensions in categories.items()})
+        self.extensions = MappingProxyType({extension: name for name, extensions in self.categories.items()
+                                            for extension in extensions})
+        self.sniff = sniff
+        self.cache_path = cache_path
+        self._cache: Optional[TypeCache] = None
+
+    def by_extension(self, name: str) -> Optional[str]:
+        return self.extensions.get(os.path.splitext(name)[1][1:].upper())
+
+    def classify(self, path: str, entry: os.DirEntry = None) -> Optional[str]:
+        """Category of the file at `path`, pass its os.scandir entry when there is one"""
+        category = self.by_extension(path)
+        if category or not self.sniff:
+            return category
+        try:
+            stat = entry.stat() if entry is not None else os.stat(path)
+            if self._cache is None:
+                # opened on the first unknown file, a tree of known extensions never creates it
+                self._cache = TypeCache(self.cache_path)
+            found, extension = self._cache.get(stat)
+            if not found:
+                with open(path, 'rb') as file:
+                    extension = sniff(file.read(SNIFF_SIZE))
+                self._cache.put(stat, extension)
+        except OSError:
+            return None
+        if extension is None:
+            return None
+        return self.extensions.get(extension) or self.extensions.get(ALIASES.get(extension))
+
+    def commit(self) -> None:
+        if self._cache is not None:
+            self._cache.commit()
+
+    def close(self) -> None:
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
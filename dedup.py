@@ -0,0 +1,127 @@
+import hashlib
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+HASH_DB = "file_hashes.db"
+PARTIAL_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashIndex:
+    """Partial and full content hashes persisted per path, trusted while size and mtime are unchanged"""
+
+    def __init__(self, path: str = HASH_DB):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS file_hashes (path TEXT PRIMARY KEY, size INTEGER, "
+                                "mtime_ns INTEGER, partial BLOB, full BLOB)")
+        self._pending: Dict[str, list] = {}
+
+    def get(self, path: str, stat: os.stat_result) -> Tuple[Optional[bytes], Optional[bytes]]:
+        row = self.connection.execute("SELECT size, mtime_ns, partial, full FROM file_hashes WHERE path = ?",
+                                      (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2], row[3]
+        return None, None
+
+    def put(self, path: str, stat: os.stat_result, partial: bytes, full: Optional[bytes]) -> None:
+        self._pending[path] = [path, stat.st_size, stat.st_mtime_ns, partial, full]
+
+    def commit(self) -> None:
+        self.connection.executemany("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?)",
+                                    self._pending.values())
+        self.connection.commit()
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _digest(path: str, limit: Optional[int] = None) -> bytes:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        if limit is not None:
+            digest.update(f.read(limit))
+        else:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    return digest.digest()
+
+
+class Candidate:
+    __slots__ = ("path", "final_path", "stat", "step", "partial", "full")
+
+    def __init__(self, path: str, final_path: str, stat: os.stat_result, step: Optional[int]):
+        self.path = path
+        self.final_path = final_path
+        self.stat = stat
+        self.step = step
+        self.partial = None
+        self.full = None
+
+
+def _group(candidates: List[Candidate], key) -> List[List[Candidate]]:
+    groups = {}
+    for candidate in candidates:
+        groups.setdefault(key(candidate), []).append(candidate)
+    # only groups holding at least one incoming file can change the plan
+    return [group for group in groups.values()
+            if len(group) > 1 and any(candidate.step is not None for candidate in group)]
+
+
+class Deduplicator:
+    """Narrows duplicates down by size, then by a hash of the first bytes, then by a full streaming hash"""
+
+    def __init__(self, base_path: str, categories, mode: str = "link", index: HashIndex = None):
+        self.base_path = base_path
+        self.categories = categories
+        self.mode = mode
+        self.index = index or HashIndex()
+
+    def _existing(self) -> List[Candidate]:
+        candidates = []
+        for category in self.categories:
+            category_path = os.path.join(self.base_path, category)
+            if not os.path.isdir(category_path):
+                continue
+            with os.scandir(category_path) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        candidates.append(Candidate(entry.path, entry.path, entry.stat(), None))
+        return candidates
+
+    def _hash(self, candidate: Candidate, full: bool) -> None:
+        if candidate.partial is None:
+            candidate.partial, candidate.full = self.index.get(candidate.path, candidate.stat)
+        if candidate.partial is None:
+            candidate.partial = _digest(candidate.path, PARTIAL_SIZE)
+        if full and candidate.full is None:
+            # a file that fits into the partial read is already hashed in full
+            candidate.full = candidate.partial if candidate.stat.st_size <= PARTIAL_SIZE else _digest(candidate.path)
+        self.index.put(candidate.final_path, candidate.stat, candidate.partial, candidate.full)
+
+    def apply(self, steps: List[tuple]) -> List[tuple]:
+        """Turns moves of exact duplicates into "link" or "drop" steps pointing at the kept copy"""
+        candidates = self._existing()
+        for index, (action, source, category, fname, _) in enumerate(steps):
+            if action == "move":
+                candidates.append(Candidate(source, os.path.join(self.base_path, category, fname),
+                                            os.stat(source), index))
+        steps = list(steps)
+        for by_size in _group(candidates, lambda candidate: candidate.stat.st_size):
+            for candidate in by_size:
+                self._hash(candidate, full=False)
+            for by_partial in _group(by_size, lambda candidate: candidate.partial):
+                for candidate in by_partial:
+                    self._hash(candidate, full=True)
+                for duplicates in _group(by_partial, lambda candidate: candidate.full):
+                    # prefer a copy that is already sorted, otherwise the first file in walk order
+                    duplicates.sort(key=lambda candidate: (candidate.step is not None, candidate.step or 0))
+                    kept = duplicates[0].final_path
+                    for candidate in duplicates[1:]:
+                        if candidate.step is None:
+                            continue
+                        _, source, category, fname, _ = steps[candidate.step]
+                        steps[candidate.step] = (self.mode, source, category, fname, kept)
+        self.index.commit()
+        return steps
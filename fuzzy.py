@@ -0,0 +1,209 @@
+"""Typo-tolerant contact name lookup backed by an in-memory trigram index.
+
+The index is built from records.name and then follows the ORM writes of every session: changes
+collected at flush are applied on commit and dropped on rollback. The build reads every name, about
+15 s for a million contacts, so the interactive book and the async service start it with warm() on
+a background thread. A lookup never waits for a build that is running, it gets no suggestions until
+the index is there: inside AsyncSession.run_sync, waiting on the lock would block the event loop
+that the build needs to fetch its rows.
+"""
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from model import Records, Session as SessionFactory
+
+SUGGESTIONS = 5
+# postings of the rarest trigrams give the candidates, very common ones are only used for scoring
+MAX_CANDIDATES = 20000
+SHORTLIST = 10
+MIN_SCORE = 0.3
+
+
+def trigrams(name: str) -> Set[str]:
+    padded = f"  {name.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Trigram -> posting list of record ids in ascending order, so a removed or renamed name is found by bisection"""
+
+    def __init__(self):
+        self.names: Dict[int, str] = {}
+        self.postings: Dict[str, array] = {}
+        self.lock = threading.Lock()
+
+    def add(self, record_id: int, name: str) -> None:
+        with self.lock:
+            if self.names.get(record_id) == name:
+                return
+            self._remove(record_id)
+            self.names[record_id] = name
+            for trigram in trigrams(name):
+                insort(self.postings.setdefault(trigram, array("l")), record_id)
+
+    def remove(self, record_id: int) -> None:
+        with self.lock:
+            self._remove(record_id)
+
+    def _remove(self, record_id: int) -> None:
+        name = self.names.pop(record_id, None)
+        if name is None:
+            return
+        for trigram in trigrams(name):
+            posting = self.postings.get(trigram)
+            if posting is None:
+                continue
+            position = bisect_left(posting, record_id)
+            if position < len(posting) and posting[position] == record_id:
+                del posting[position]
+                if not posting:
+                    del self.postings[trigram]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def suggest(self, query: str, k: int = SUGGESTIONS) -> List[Tuple[str, float]]:
+        """Up to k (name, score) pairs, best first"""
+        query_trigrams = trigrams(query)
+        with self.lock:
+            lists = sorted((self.postings[i] for i in query_trigrams if i in self.postings), key=len)
+            counts = Counter()
+            for posting in lists:
+                if counts and len(counts) + len(posting) > MAX_CANDIDATES:
+                    break
+                counts.update(posting)
+            names = self.names
+            # shared rare trigrams shortlist the candidates, only the shortlist gets exact scores
+            candidates = {names[i] for i, _ in counts.most_common(k * SHORTLIST) if i in names}
+        scored = []
+        for name in candidates:
+            name_trigrams = trigrams(name)
+            dice = 2 * len(query_trigrams & name_trigrams) / (len(query_trigrams) + len(name_trigrams))
+            if dice >= MIN_SCORE:
+                ratio = SequenceMatcher(None, query.lower(), name.lower()).ratio()
+                scored.append((name, (dice + ratio) / 2))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, str]]) -> "TrigramIndex":
+        """Index of (record id, name) rows, which come in ascending id order"""
+        index = cls()
+        names, postings = index.names, index.postings
+        for record_id, name in rows:
+            if name:
+                names[record_id] = name
+                for trigram in trigrams(name):
+                    posting = postings.get(trigram)
+                    if posting is None:
+                        posting = postings[trigram] = array("l")
+                    posting.append(record_id)
+        return index
+
+
+_index: Optional[TrigramIndex] = None
+_build_lock = threading.Lock()
+# changes committed while the index is built, they are applied to it before it is published
+_backlog: Optional[list] = None
+_changes_lock = threading.Lock()
+
+
+def get_index(session, wait: bool = True) -> Optional[TrigramIndex]:
+    """The index, built with `session` when there is none; None without `wait` while another build runs"""
+    global _index, _backlog
+    if _index is None:
+        if not _build_lock.acquire(blocking=wait):
+            return None
+        try:
+            if _index is None:
+                with _changes_lock:
+                    _backlog = []
+                index = None
+                try:
+                    rows = session.query(Records.id, Records.name).order_by(Records.id) \
+                        .execution_options(yield_per=10000)
+                    index = TrigramIndex.build(rows)
+                finally:
+                    # a change committed before the rows were read is applied again, add and remove allow it
+                    with _changes_lock:
+                        if index is not None:
+                            _apply(index, _backlog)
+                            _index = index
+                        _backlog = None
+        finally:
+            _build_lock.release()
+    return _index
+
+
+def warm(session_factory=SessionFactory) -> threading.Thread:
+    """Builds the index on a daemon thread with its own session, so the first typo does not wait for it"""
+
+    def build() -> None:
+        session = session_factory()
+        try:
+            get_index(session)
+        finally:
+            session.close()
+
+    thread = threading.Thread(target=build, name="fuzzy-index", daemon=True)
+    thread.start()
+    return thread
+
+
+def reset_index() -> None:
+    global _index
+    _index = None
+
+
+def suggest(session, name: str, k: int = SUGGESTIONS) -> List[str]:
+    index = get_index(session, wait=False)
+    return [i for i, _ in index.suggest(name, k)] if index is not None else []
+
+
+def track_inserted(session, rows: Iterable[Tuple[int, str]]) -> None:
+    """Registers rows written with Core inserts, which the flush events do not see"""
+    session.info.setdefault("fuzzy_changes", []).extend(("add", record_id, name) for record_id, name in rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context) -> None:
+    changes = session.info.setdefault("fuzzy_changes", [])
+    for obj in session.new:
+        if isinstance(obj, Records):
+            changes.append(("add", obj.id, obj.name))
+    for obj in session.dirty:
+        if isinstance(obj, Records) and inspect(obj).attrs.name.history.has_changes():
+            changes.append(("remove", obj.id, None))
+            changes.append(("add", obj.id, obj.name))
+    for obj in session.deleted:
+        if isinstance(obj, Records):
+            changes.append(("remove", obj.id, None))
+
+
+def _apply(index: TrigramIndex, changes: Iterable[Tuple[str, int, Optional[str]]]) -> None:
+    for action, record_id, name in changes:
+        if action == "add":
+            index.add(record_id, name)
+        else:
+            index.remove(record_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session) -> None:
+    changes = session.info.pop("fuzzy_changes", None)
+    if changes:
+        with _changes_lock:
+            if _index is not None:
+                _apply(_index, changes)
+            elif _backlog is not None:
+                _backlog.extend(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changes(session) -> None:
+    session.info.pop("fuzzy_changes", None)
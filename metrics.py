@@ -0,0 +1,215 @@
+"""In-process timing histograms for commands, SQL and the sorter stages.
+
+    with metrics.measure("command", "find_contact"):
+        ...
+
+records the wall time of the block together with the SQL statements it ran, their time and the
+rows they returned or changed (see instrument()). A measured block inside another one also adds
+its SQL to the outer block. The `stats` command prints summary(); setting ADDRESS_BOOK_METRICS
+to a .jsonl path appends one line per measured block, to a .prom path keeps a Prometheus
+textfile with the histograms up to date.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+EXPORT_ENV = "ADDRESS_BOOK_METRICS"
+RESERVOIR = 2048
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000, 10000, 100000)
+# metric name -> (help text, buckets)
+METRICS = {
+    "duration_seconds": ("Wall time of a command or sorter stage", SECONDS_BUCKETS),
+    "sql_statements": ("SQL statements run by a command", COUNT_BUCKETS),
+    "sql_seconds": ("Time spent in SQL statements by a command", SECONDS_BUCKETS),
+    "sql_rows": ("Rows returned or changed by the SQL of a command", COUNT_BUCKETS),
+}
+
+
+class Histogram:
+    """Cumulative buckets for export plus the latest RESERVOIR values for percentiles"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=RESERVOIR)
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        with self.lock:
+            values = sorted(self.samples)
+        return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class Frame:
+    __slots__ = ("statements", "sql_seconds", "rows")
+
+    def __init__(self):
+        self.statements, self.sql_seconds, self.rows = 0, 0.0, 0
+
+
+_histograms: Dict[Tuple[str, str, str], Histogram] = {}
+_registry_lock = threading.Lock()
+_frame: ContextVar[Optional[Frame]] = ContextVar("metrics_frame", default=None)
+
+
+def histogram(metric: str, kind: str, name: str) -> Histogram:
+    key = (metric, kind, name)
+    found = _histograms.get(key)
+    if found is None:
+        with _registry_lock:
+            found = _histograms.setdefault(key, Histogram(METRICS[metric][1]))
+    return found
+
+
+def observe(kind: str, name: str, seconds: float) -> None:
+    """Records a duration without SQL figures, cheap enough for every file the sorter moves"""
+    histogram("duration_seconds", kind, name).observe(seconds)
+
+
+@contextmanager
+def measure(kind: str, name: str):
+    parent = _frame.get()
+    frame = Frame()
+    token = _frame.set(frame)
+    start = time.perf_counter()
+    try:
+        yield frame
+    finally:
+        seconds = time.perf_counter() - start
+        _frame.reset(token)
+        histogram("duration_seconds", kind, name).observe(seconds)
+        histogram("sql_statements", kind, name).observe(frame.statements)
+        histogram("sql_seconds", kind, name).observe(frame.sql_seconds)
+        histogram("sql_rows", kind, name).observe(frame.rows)
+        if parent is not None:
+            parent.statements += frame.statements
+            parent.sql_seconds += frame.sql_seconds
+            parent.rows += frame.rows
+        export(kind, name, seconds, frame, parent is None)
+
+
+def add_rows(count: int) -> None:
+    frame = _frame.get()
+    if frame is not None:
+        frame.rows += count
+
+
+class Cursor(sqlite3.Cursor):
+    """Counts the fetched rows into the measured block"""
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            add_rows(1)
+        return row
+
+    def fetchmany(self, size: int = None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        add_rows(len(rows))
+        return rows
+
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection factory whose cursors count rows, passed as connect_args={"factory": ...}"""
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    seconds = time.perf_counter() - conn.info["metrics_start"].pop()
+    frame = _frame.get()
+    if frame is not None:
+        frame.statements += 1
+        frame.sql_seconds += seconds
+        if cursor.description is None and cursor.rowcount > 0:
+            frame.rows += cursor.rowcount
+
+
+def instrument(engine) -> None:
+    """Counts the statements of a (sync) engine and their time into the measured block"""
+    from sqlalchemy import event
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def summary() -> List[Dict]:
+    """Per measured block: runs, p50/p95/p99 wall time and mean SQL statements, time and rows"""
+    result = []
+    for (metric, kind, name), duration in sorted(_histograms.items()):
+        if metric != "duration_seconds":
+            continue
+        row = {"kind": kind, "name": name, "count": duration.count, "p50": duration.quantile(0.5),
+               "p95": duration.quantile(0.95), "p99": duration.quantile(0.99)}
+        for sql_metric in ("sql_statements", "sql_seconds", "sql_rows"):
+            found = _histograms.get((sql_metric, kind, name))
+            row[sql_metric] = found.mean() if found else 0.0
+        result.append(row)
+    return result
+
+
+def prometheus() -> str:
+    lines = []
+    for metric, (help_text, _) in METRICS.items():
+        full_name = f"address_book_{metric}"
+        lines += [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} histogram"]
+        for (name_of, kind, name), found in sorted(_histograms.items()):
+            if name_of != metric:
+                continue
+            labels = f'kind="{kind}",name="{name}"'
+            with found.lock:
+                counts, total, count = list(found.counts), found.sum, found.count
+            cumulative = 0
+            for bound, bucket in zip(found.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{full_name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{full_name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{full_name}_sum{{{labels}}} {total}")
+            lines.append(f"{full_name}_count{{{labels}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def export(kind: str, name: str, seconds: float, frame: Frame, top_level: bool) -> None:
+    path = os.environ.get(EXPORT_ENV)
+    if not path:
+        return
+    if path.endswith(".prom"):
+        if top_level:
+            # the textfile collector may read at any time, so the file is replaced whole
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                file.write(prometheus())
+            os.replace(path + ".tmp", path)
+        return
+    line = {"time": time.time(), "kind": kind, "name": name, "seconds": seconds, "sql_statements": frame.statements,
+            "sql_seconds": frame.sql_seconds, "sql_rows": frame.rows}
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(line) + "\n")
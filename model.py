@@ -1,50 +1,133 @@
+import os
+import re
+from configparser import ConfigParser
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
 from sqlalchemy import Date
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, DDL, Integer, String, ForeignKey, Index, Table
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session as OrmSession, scoped_session, sessionmaker, relationship, validates
+from sqlalchemy.pool import QueuePool
+import metrics
+from validators import birthday_valid, phone_valid
 
 Base = declarative_base()
 from sqlalchemy.engine import Engine
 from sqlalchemy import event
 
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+# SQLite pragmas applied to every new connection, overridden by the [sqlite] section of
+# alembic.ini and then by ADDRESS_BOOK_<PRAGMA> environment variables
+ENGINE_PROFILE = {"busy_timeout": "5000", "journal_mode": "WAL", "synchronous": "NORMAL",
+                  "cache_size": "-65536", "mmap_size": "268435456", "temp_store": "MEMORY"}
+
+
+# connection pool of the address book engine, configured the same way
+POOL_OPTIONS = {"pool_size": "5", "max_overflow": "10", "pool_timeout": "30", "pool_recycle": "-1"}
+
+
+def _settings(defaults: Dict[str, str], config_file: str) -> Dict[str, str]:
+    settings = dict(defaults)
+    config = ConfigParser(interpolation=None)
+    config.read(config_file)
+    if config.has_section("sqlite"):
+        settings.update({k: v for k, v in config.items("sqlite") if k in defaults})
+    for key in defaults:
+        settings[key] = os.environ.get(f"ADDRESS_BOOK_{key.upper()}", settings[key])
+    for key, value in settings.items():
+        if not re.fullmatch(r"-?\w+", value):
+            raise ValueError(f"Invalid value {value!r} for {key}")
+    return settings
+
+
+def engine_profile(config_file: str = CONFIG_FILE) -> Dict[str, str]:
+    return _settings(ENGINE_PROFILE, config_file)
+
+
+def pool_options(config_file: str = CONFIG_FILE) -> Dict[str, int]:
+    return {k: int(v) for k, v in _settings(POOL_OPTIONS, config_file).items()}
+
+
+def apply_profile(dbapi_connection, pragmas: Dict[str, str]) -> None:
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+    for key, value in pragmas.items():
+        cursor.execute(f"PRAGMA {key}={value}")
     cursor.close()
 
 
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    apply_profile(dbapi_connection, engine_profile())
+
+
+def birthday_key(birthday) -> Optional[int]:
+    """Month and day of a birthday packed as MMDD, so a date window becomes an integer range"""
+    if isinstance(birthday, str):
+        try:
+            birthday = datetime.strptime(birthday, "%d.%m.%Y")
+        except ValueError:
+            return None
+    return birthday.month * 100 + birthday.day if birthday else None
+
+
 class Phones(Base):
+    """A number in E.164 form, "+" and up to 15 digits, so equal numbers compare equal as text"""
     __tablename__ = "phones"
     id = Column(Integer, primary_key=True)
-    number = Column(Integer)
-    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'))
+    number = Column(String(16), index=True)
+    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'), index=True)
     records = relationship("Records", back_populates="phones")
 
+    @validates("number")
+    def validate_number(self, key, number):
+        return phone_valid(number)
+
 
 class Notes(Base):
     __tablename__ = "notes"
     id = Column(Integer, primary_key=True)
     title = Column(String)
-    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'))
+    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'), index=True)
     records = relationship("Records", back_populates="notes")
-    tags = relationship("Tags", back_populates="notes", passive_deletes='all')
+    tags = relationship("Tags", secondary="note_tags", back_populates="notes", passive_deletes=True)
+
+
+# a note carries a tag at most once; (tag_id, note_id) serves the "notes with tag" lookups
+note_tags = Table("note_tags", Base.metadata,
+                  Column("note_id", Integer, ForeignKey('notes.id', ondelete='CASCADE'), primary_key=True),
+                  Column("tag_id", Integer, ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+                  Index("ix_note_tags_tag_id", "tag_id", "note_id"),
+                  sqlite_with_rowid=False)
 
 
 class Tags(Base):
+    """One row per distinct tag, usage_count is kept by the note_tags triggers"""
     __tablename__ = "tags"
     id = Column(Integer, primary_key=True)
-    title = Column(String)
-    notes_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'))
-    notes = relationship("Notes", back_populates="tags")
+    title = Column(String(collation="NOCASE"), nullable=False, unique=True)
+    usage_count = Column(Integer, nullable=False, default=0, server_default="0")
+    notes = relationship("Notes", secondary=note_tags, back_populates="tags", passive_deletes=True)
+
+
+Index("ix_tags_usage_count", Tags.usage_count.desc(), Tags.title)
+
+TAG_COUNT_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS note_tags_count_ai AFTER INSERT ON note_tags BEGIN "
+    "UPDATE tags SET usage_count = usage_count + 1 WHERE id = new.tag_id; END",
+    "CREATE TRIGGER IF NOT EXISTS note_tags_count_ad AFTER DELETE ON note_tags BEGIN "
+    "UPDATE tags SET usage_count = usage_count - 1 WHERE id = old.tag_id; END",
+)
+for statement in TAG_COUNT_TRIGGERS:
+    event.listen(note_tags, "after_create", DDL(statement))
 
 
 class Addresses(Base):
     __tablename__ = "addresses"
     id = Column(Integer, primary_key=True)
     title = Column(String)
-    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'))
+    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'), index=True)
     records = relationship("Records", back_populates="addresses")
 
 
@@ -52,23 +135,80 @@ class Emails(Base):
     __tablename__ = "emails"
     id = Column(Integer, primary_key=True)
     title = Column(String)
-    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'))
+    records_id = Column(Integer, ForeignKey('records.id', ondelete='CASCADE'), index=True)
     records = relationship("Records", back_populates="emails")
 
 
 class Records(Base):
     __tablename__ = "records"
     id = Column(Integer, primary_key=True)
-    name = Column(String)
-    birthday = Column(String)
+    name = Column(String, index=True)
+    birthday = Column(Date)
+    birthday_day = Column(Integer, index=True)
     phones = relationship("Phones", back_populates="records", passive_deletes='all')
     notes = relationship("Notes", back_populates="records", passive_deletes='all')
     addresses = relationship("Addresses", back_populates="records", passive_deletes='all')
     emails = relationship("Emails", back_populates="records", passive_deletes='all')
 
+    @validates("birthday")
+    def validate_birthday(self, key, birthday):
+        birthday = birthday_valid(birthday) if birthday else None
+        self.birthday_day = birthday_key(birthday)
+        return birthday
+
+
+# lookups compare names exactly through ix_records_name, this one keeps "Anna" and "ANNA" apart
+Index("uq_records_name_nocase", Records.__table__.c.name.collate("NOCASE"), unique=True)
+
+DB_URL = "sqlite:///address_book.db"
+_engine = None
+
+
+def get_engine() -> Engine:
+    """The address book engine, created together with its pragma profile on first use"""
+    global _engine
+    if _engine is None:
+        # a local file never drops the connection, so no pre-ping round trip on checkout;
+        # pooled connections move between worker threads, each used by one thread at a time
+        _engine = create_engine(DB_URL, poolclass=QueuePool,
+                                connect_args={"check_same_thread": False, "factory": metrics.Connection},
+                                **pool_options())
+        event.listen(_engine, "connect", set_sqlite_pragma)
+        metrics.instrument(_engine)
+    return _engine
+
+
+def __getattr__(name):
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazySession(OrmSession):
+    """Session that binds itself to the address book engine on its first query"""
+
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(*args, **kwargs)
+
+
+# objects stay readable after commit without a refresh SELECT, unit_of_work() drops them afterwards
+Session = sessionmaker(class_=LazySession, expire_on_commit=False)
+# proxy to the session of the current thread
+session = scoped_session(Session)
 
-engine = create_engine("sqlite:///address_book.db", pool_pre_ping=True)
 
-Session = sessionmaker(bind=engine)
-session = Session()
+@contextmanager
+def unit_of_work():
+    """Commits what the block did, or rolls it back, then closes the thread's session
+    so that the next unit starts with an empty identity map"""
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.remove()
 
@@ -0,0 +1,213 @@
+"""Address book operations with plain arguments and return values.
+
+They work on the given session without committing, so the caller decides where a transaction
+ends, and raise OperationError instead of printing when a request cannot be applied.
+"""
+from inspect import signature
+from typing import Dict, List, Optional
+import fuzzy
+from bulk import InvalidRow, split_values, validate
+from metrics import measure
+from model import Addresses, Emails, Notes, Phones, Records
+from queries import contact_query, load_contact, upcoming_birthdays
+from search import search as full_text_search
+from tags import normalize as normalize_tag, iter_notes_with_tags, notes_with_tags, tag_cloud as top_tags, tag_note, \
+    titles_of
+from validators import InvalidBirthday, InvalidEmailAddress, InvalidPhoneNumber, \
+    birthday_text, birthday_valid, email_valid, phone_valid
+
+
+class OperationError(Exception):
+    """Exception for a request that cannot be applied to the address book"""
+
+
+def contact_dict(record: Records) -> Dict:
+    return {"id": record.id, "name": record.name, "birthday": birthday_text(record.birthday) or None,
+            "phones": [i.number for i in record.phones], "emails": [i.title for i in record.emails],
+            "addresses": [i.title for i in record.addresses],
+            "notes": [{"id": i.id, "title": i.title} for i in record.notes]}
+
+
+def _contact(session, name: str, collections=()) -> Records:
+    record = load_contact(session, name=str(name).strip().capitalize(), collections=collections)
+    if record is None:
+        suggestions = fuzzy.suggest(session, str(name).strip())
+        hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        raise OperationError(f"There is no contact with name: {name}.{hint}")
+    return record
+
+
+def _name_taken(session, name: str, record_id: int = None) -> bool:
+    qs = session.query(Records.id).filter(Records.name.collate("NOCASE") == name)
+    if record_id is not None:
+        qs = qs.filter(Records.id != record_id)
+    return session.query(qs.exists()).scalar()
+
+
+def add_contact(session, name: str, birthday: str = "", phones=(), emails=(), addresses=(), notes=()) -> Dict:
+    try:
+        contact = validate({"name": name, "birthday": birthday, "phones": phones, "emails": emails,
+                            "addresses": addresses, "notes": notes})
+    except InvalidRow as e:
+        raise OperationError(str(e))
+    if _name_taken(session, contact["name"]):
+        raise OperationError(f"The username {contact['name']} is already registered in the address book.")
+    record = Records(name=contact["name"], birthday=contact["birthday"],
+                     phones=[Phones(number=i) for i in contact["phones"]],
+                     emails=[Emails(title=i) for i in contact["emails"]],
+                     addresses=[Addresses(title=i) for i in contact["addresses"]],
+                     notes=[Notes(title=i) for i in contact["notes"]])
+    session.add(record)
+    session.flush()
+    return {"id": record.id, "name": record.name}
+
+
+def _replace(session, old: List, new: List) -> List:
+    for row in old:
+        session.delete(row)
+    return new
+
+
+def edit_contact(session, name: str, new_name: str = None, birthday: str = None, phones=None, emails=None,
+                 addresses=None) -> Dict:
+    """Changes the given fields, a list given for phones, emails or addresses replaces the old one"""
+    record = _contact(session, name, ("phones", "emails", "addresses"))
+    # everything is checked before the record is touched, so a rejected edit leaves no changes behind
+    try:
+        if birthday is not None:
+            birthday = birthday_valid(birthday)
+        phones = None if phones is None else [phone_valid(i) for i in split_values(phones)]
+        emails = None if emails is None else [email_valid(i) for i in split_values(emails)]
+    except InvalidBirthday:
+        raise OperationError(f"The birthday {birthday} is invalid")
+    except InvalidPhoneNumber:
+        raise OperationError(f"The phone number {phones} is invalid")
+    except InvalidEmailAddress:
+        raise OperationError(f"The email {emails} is invalid")
+    if new_name:
+        new_name = new_name.strip().capitalize()
+        if _name_taken(session, new_name, record.id):
+            raise OperationError(f"The username {new_name} is already registered in the address book.")
+        record.name = new_name
+    if birthday is not None:
+        record.birthday = birthday
+    # the collections do not cascade orphans (passive_deletes="all"), the rows they replace are deleted here
+    if phones is not None:
+        record.phones = _replace(session, record.phones, [Phones(number=i) for i in phones])
+    if emails is not None:
+        record.emails = _replace(session, record.emails, [Emails(title=i) for i in emails])
+    if addresses is not None:
+        record.addresses = _replace(session, record.addresses, [Addresses(title=i) for i in split_values(addresses)])
+    session.flush()
+    return {"id": record.id, "name": record.name}
+
+
+def del_contact(session, name: str) -> Dict:
+    record = _contact(session, name)
+    session.delete(record)
+    session.flush()
+    return {"id": record.id, "name": record.name}
+
+
+def find_contact(session, name: str) -> Dict:
+    return contact_dict(_contact(session, name, ("phones", "emails", "addresses", "notes")))
+
+
+def add_note(session, name: str, note: str) -> Dict:
+    record = _contact(session, name)
+    note = Notes(title=note.strip(), records_id=record.id)
+    session.add(note)
+    session.flush()
+    return {"id": note.id, "title": note.title}
+
+
+def del_note(session, note_id: int) -> Dict:
+    note = session.get(Notes, int(note_id))
+    if note is None:
+        raise OperationError(f"There is no note with id: {note_id}.")
+    session.delete(note)
+    session.flush()
+    return {"id": note.id, "title": note.title}
+
+
+def print_notes(session, name: str) -> List[Dict]:
+    return contact_dict(_contact(session, name, ("notes",)))["notes"]
+
+
+def add_tag(session, note_id: int, tag: str) -> Dict:
+    note = session.get(Notes, int(note_id))
+    if note is None:
+        raise OperationError(f"There is no note with id: {note_id}.")
+    if not normalize_tag(tag):
+        raise OperationError("The tag is empty.")
+    new_tag = tag_note(session, note, [tag])[0]
+    return {"id": new_tag.id, "title": new_tag.title, "note_id": note.id}
+
+
+def find_note(session, tag: str) -> List[Dict]:
+    return [{"id": i.id, "title": i.title} for page in iter_notes_with_tags(session, [tag]) for i in page]
+
+
+def find_notes(session, tags, match: str = "all", after_id: int = 0, limit: int = 100) -> List[Dict]:
+    """Notes carrying all (or with match="any", any) of the tags, a keyset page ordered by note id"""
+    if match not in ("all", "any"):
+        raise OperationError(f"Unknown match mode: {match}, use all or any.")
+    return [{"id": i.id, "title": i.title, "name": i.name}
+            for i in notes_with_tags(session, titles_of(tags), match == "all", after_id, limit)]
+
+
+def tag_cloud(session, limit: int = 50) -> List[Dict]:
+    return [{"title": title, "count": count} for title, count in top_tags(session, limit)]
+
+
+def holidays_period(session, period: int) -> List[str]:
+    if int(period) < 0:
+        raise OperationError(f"The period {period} is negative, give a number of days from today.")
+    return upcoming_birthdays(session, min(int(period), 365))
+
+
+def search(session, query: str, limit: int = 20) -> List[Dict]:
+    return [{"name": name, "kind": kind, "text": body}
+            for name, kind, body in full_text_search(session, query, int(limit))]
+
+
+def show_contacts(session, after_id: int = 0, limit: int = 100) -> List[Dict]:
+    """One keyset page of contacts, pass the last id back as after_id for the next one"""
+    qs = contact_query(session).filter(Records.id > int(after_id)).order_by(Records.id).limit(int(limit))
+    return [contact_dict(i) for i in qs]
+
+
+OPERATIONS = {"add_contact": add_contact, "edit_contact": edit_contact, "del_contact": del_contact,
+              "find_contact": find_contact, "show_contacts": show_contacts, "add_note": add_note,
+              "del_note": del_note, "print_notes": print_notes, "add_tag": add_tag, "find_note": find_note,
+              "find_notes": find_notes, "tag_cloud": tag_cloud, "holidays_period": holidays_period,
+              "search": search}
+
+
+def run(session, command: str, args: Optional[Dict] = None):
+    try:
+        operation = OPERATIONS[command]
+    except KeyError:
+        raise OperationError(f"Unknown command: {command}")
+    try:
+        bound = signature(operation).bind(session, **(args or {}))
+    except TypeError as e:
+        raise OperationError(f"Wrong arguments for {command}: {e}")
+    parameters = bound.signature.parameters
+    args = {key: _coerce(command, parameters[key], value) for key, value in bound.arguments.items()
+            if key != "session"}
+    with measure("operation", command):
+        return operation(session, **args)
+
+
+def _coerce(command: str, parameter, value):
+    """A str or int argument in its annotated type, e.g. note=5 from the command line as "5" """
+    kind = parameter.annotation
+    if value is None or kind not in (str, int):
+        return value
+    try:
+        if not isinstance(value, (str, int, float)):
+            raise ValueError
+        return kind(value)
+    except ValueError:
+        raise OperationError(f"Wrong arguments for {command}: {parameter.name} is not a valid {kind.__name__}")
@@ -0,0 +1,144 @@
+"""Curses menu over a query that never holds more than one screen of rows.
+
+The query selects the label shown in the menu first and a unique key second, e.g.
+session.query(Notes.title, Notes.id).filter(...). Rows are read a screen at a time with keyset
+pagination on (label, key), and typing narrows them with a case-insensitive prefix filter that
+runs in SQL, so a menu over a million contacts behaves like one over ten.
+"""
+from typing import Optional, Tuple
+from sqlalchemy import or_
+
+ENTER = ("\n", "\r")
+ESCAPE = "\x1b"
+BACKSPACE = ("\x7f", "\b")
+HEADER_LINES = 3
+
+
+class QueryPicker:
+
+    def __init__(self, query, title: str, indicator: str = "=>", page_size: int = 20):
+        self.query, self.title, self.indicator = query, title, indicator
+        columns = query.column_descriptions
+        self.label, self.key = columns[0]["expr"].collate("NOCASE"), columns[1]["expr"]
+        self.page_size = page_size
+        self.text = ""
+        self.rows, self.index = [], 0
+        self.has_prev = self.has_next = False
+
+    def _filtered(self):
+        if not self.text:
+            return self.query
+        pattern = self.text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return self.query.filter(self.label.like(f"{pattern}%", escape="\\"))
+
+    def load(self, bound: Optional[Tuple] = None, forward: bool = True) -> None:
+        """Reads the screen after `bound`, or before it when not `forward`; the first one without a bound"""
+        qs = self._filtered()
+        if bound is not None:
+            # label > :l OR (label = :l AND key > :k), with the label range spelled out on its own:
+            # SQLite searches the index for that range, a row value or a bare OR makes it scan the index
+            label, key = bound
+            if forward:
+                qs = qs.filter(self.label >= label, or_(self.label > label, self.key > key))
+            else:
+                qs = qs.filter(self.label <= label, or_(self.label < label, self.key < key))
+        order = (self.label, self.key) if forward else (self.label.desc(), self.key.desc())
+        rows = qs.order_by(*order).limit(self.page_size + 1).all()
+        more, rows = len(rows) > self.page_size, rows[:self.page_size]
+        if forward:
+            self.rows, self.has_prev, self.has_next = rows, bound is not None, more
+        elif not more and len(rows) < self.page_size:
+            # fewer rows than a screen are left before the bound, so show the top of the list instead
+            self.load()
+        else:
+            self.rows, self.has_prev, self.has_next = rows[::-1], more, True
+
+    def next_page(self) -> bool:
+        if not self.has_next:
+            return False
+        self.load(tuple(self.rows[-1][:2]))
+        return True
+
+    def prev_page(self) -> bool:
+        if not self.has_prev:
+            return False
+        self.load(tuple(self.rows[0][:2]), forward=False)
+        return True
+
+    def down(self) -> None:
+        if self.index < len(self.rows) - 1:
+            self.index += 1
+        elif self.next_page():
+            self.index = 0
+
+    def up(self) -> None:
+        if self.index > 0:
+            self.index -= 1
+        elif self.prev_page():
+            self.index = len(self.rows) - 1
+
+    def type(self, text: str) -> None:
+        self.text = text
+        self.index = 0
+        self.load()
+
+    def selected(self):
+        return self.rows[self.index] if self.rows else None
+
+    def draw(self, screen) -> None:
+        screen.erase()
+        height, width = screen.getmaxyx()
+        hint = "type to filter, arrows and PgUp/PgDn to move, Enter to select, Esc to cancel"
+        lines = [self.title, f"Filter: {self.text}", hint]
+        for number, row in enumerate(self.rows):
+            prefix = self.indicator if number == self.index else " " * len(self.indicator)
+            lines.append(f"{prefix} {row[0]}")
+        if not self.rows:
+            lines.append("Nothing found.")
+        for y, line in enumerate(lines[:height]):
+            screen.addnstr(y, 0, line, max(1, width - 1))
+        screen.refresh()
+
+    def run(self, screen):
+        import curses
+        curses.curs_set(0)
+        screen.keypad(True)
+        self.page_size = max(1, screen.getmaxyx()[0] - HEADER_LINES)
+        self.load()
+        while True:
+            self.draw(screen)
+            key = screen.get_wch()
+            if key in ENTER or key == curses.KEY_ENTER:
+                if self.rows:
+                    return self.selected()
+            elif key == ESCAPE:
+                return None
+            elif key == curses.KEY_DOWN:
+                self.down()
+            elif key == curses.KEY_UP:
+                self.up()
+            elif key == curses.KEY_NPAGE:
+                if self.next_page():
+                    self.index = 0
+            elif key == curses.KEY_PPAGE:
+                if self.prev_page():
+                    self.index = 0
+            elif key in BACKSPACE or key == curses.KEY_BACKSPACE:
+                self.type(self.text[:-1])
+            elif key == curses.KEY_RESIZE:
+                self.page_size = max(1, screen.getmaxyx()[0] - HEADER_LINES)
+                self.type(self.text)
+            elif isinstance(key, str) and key.isprintable():
+                self.type(self.text + key)
+
+
+def pick(*args, **kwargs):
+    """pick.pick, importing curses only when the first menu is shown"""
+    from pick import pick as pick_menu
+    return pick_menu(*args, **kwargs)
+
+
+def pick_row(query, title: str, indicator: str = "=>"):
+    """The selected row of the query, None when the menu is cancelled"""
+    import curses
+    return curses.wrapper(QueryPicker(query, title, indicator).run)
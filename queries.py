@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+from typing import Iterator, List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
+from model import Records, birthday_key
+
+PAGE_SIZE = 500
+
+
+CONTACT_COLLECTIONS = ("phones", "emails", "addresses", "notes")
+
+
+def contact_query(session, collections=CONTACT_COLLECTIONS):
+    """Records with their child collections, loaded in one SELECT per collection"""
+    return session.query(Records).options(*[selectinload(getattr(Records, i)) for i in collections])
+
+
+def load_contact(session, name: str = None, record_id: int = None,
+                 collections=CONTACT_COLLECTIONS) -> Optional[Records]:
+    """Contact graph by name or id in a fixed number of queries, or None"""
+    qs = contact_query(session, collections)
+    qs = qs.filter(Records.id == record_id) if record_id is not None else qs.filter(Records.name == name)
+    return qs.first()
+
+
+def iter_contacts(session, page_size: int = PAGE_SIZE) -> Iterator[List[Records]]:
+    """Pages of full contact graphs ordered by id, using keyset pagination"""
+    last_id = 0
+    while True:
+        page = contact_query(session).filter(Records.id > last_id).order_by(Records.id).limit(page_size).all()
+        if not page:
+            return
+        yield page
+        last_id = page[-1].id
+
+
+def upcoming_birthdays(session, period: int, today: Optional[date] = None) -> List[str]:
+    """Names of contacts whose birthday falls within `period` days from `today`"""
+    if period < 0:
+        # a window ending before it starts would be taken for one that wraps over the new year
+        raise ValueError(f"The period {period} is negative")
+    today = today or date.today()
+    end = today + timedelta(days=period)
+    start_key, end_key = birthday_key(today), birthday_key(end)
+    if end.year == today.year:
+        window = and_(Records.birthday_day >= start_key, Records.birthday_day <= end_key)
+    else:
+        # the window wraps over the new year: late-year days or early-year days
+        window = or_(Records.birthday_day >= start_key, Records.birthday_day <= end_key)
+    qs = session.query(Records.name).filter(window).order_by(Records.birthday_day < start_key, Records.birthday_day)
+    return [i[0] for i in qs]
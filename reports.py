@@ -0,0 +1,96 @@
+"""Birthday reports over the whole address book, vectorized with NumPy (needs numpy).
+
+    report = BirthdayReport.load(session)
+    report.upcoming(30)                 # record ids, the nearest birthdays first
+    report.upcoming_counts([7, 30])     # contacts with a birthday within 7 and 30 days
+    report.per_month()                  # contacts born in January .. December
+
+The birthday column is read once into arrays, after that every report is a few array operations,
+so a mailing job can ask for as many windows as it needs without going back to the database.
+A February 29 birthday is celebrated on March 1 in other years.
+"""
+import argparse
+from datetime import date
+from typing import Iterable, Optional
+import numpy as np
+from sqlalchemy import String, select, type_coerce
+from model import Records
+
+# birthday keys are MMDD, 101 .. 1231
+KEY_SLOTS = 1232
+YEAR_DAYS = 366
+
+
+class BirthdayReport:
+
+    def __init__(self, ids: np.ndarray, birthdays: np.ndarray):
+        self.ids = ids
+        self.birthdays = birthdays
+        months = birthdays.astype("datetime64[M]")
+        month = months.astype(np.int64) % 12 + 1
+        self.months = month.astype(np.int8)
+        self.keys = (month * 100 + (birthdays - months).astype(np.int64) + 1).astype(np.int16)
+
+    @classmethod
+    def load(cls, session) -> "BirthdayReport":
+        """Ids and birthdays of every contact that has one, in one query"""
+        # the ISO text goes to NumPy as it is, parsing it into date objects first would cost more than the query
+        rows = session.execute(select(Records.id, type_coerce(Records.birthday, String))
+                               .where(Records.birthday.isnot(None)).order_by(Records.id)).all()
+        ids = np.fromiter((i for i, _ in rows), dtype=np.int64, count=len(rows))
+        birthdays = np.array([i for _, i in rows], dtype="datetime64[D]")
+        return cls(ids, birthdays)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _offsets(today: date) -> np.ndarray:
+        """Days from `today` to the next time every MMDD key comes round"""
+        dates = np.datetime64(today, "D") + np.arange(YEAR_DAYS)
+        months = dates.astype("datetime64[M]")
+        keys = (months.astype(np.int64) % 12 + 1) * 100 + (dates - months).astype(np.int64) + 1
+        offsets = np.full(KEY_SLOTS, YEAR_DAYS, dtype=np.int16)
+        # written backwards, so a key seen twice in the 366 days keeps its first offset
+        offsets[keys[::-1]] = np.arange(YEAR_DAYS - 1, -1, -1)
+        if offsets[229] == YEAR_DAYS:
+            offsets[229] = offsets[301]
+        return offsets
+
+    def days_until(self, today: Optional[date] = None) -> np.ndarray:
+        """Days until the next birthday of every contact, 0 when it is today"""
+        return self._offsets(today or date.today())[self.keys]
+
+    def upcoming(self, period: int, today: Optional[date] = None) -> np.ndarray:
+        """Ids of the contacts whose birthday falls within `period` days from `today`, nearest first"""
+        days = self.days_until(today)
+        selected = np.flatnonzero(days <= period)
+        return self.ids[selected[np.argsort(days[selected], kind="stable")]]
+
+    def upcoming_counts(self, periods: Iterable[int], today: Optional[date] = None) -> np.ndarray:
+        """Number of upcoming birthdays for each period, all of them from one pass over the contacts"""
+        counts = np.cumsum(np.bincount(self.days_until(today), minlength=YEAR_DAYS))
+        return counts[np.minimum(np.asarray(list(periods)), YEAR_DAYS - 1)]
+
+    def per_month(self) -> np.ndarray:
+        """Contacts born in each month, January first"""
+        return np.bincount(self.months, minlength=13)[1:]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Birthday reports over the whole address book.")
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30], help="upcoming birthday windows")
+    return parser
+
+
+if __name__ == "__main__":
+    from calendar import month_name
+    from model import unit_of_work
+    args = build_parser().parse_args()
+    with unit_of_work() as session:
+        report = BirthdayReport.load(session)
+    print(f"{len(report)} contacts with a birthday")
+    for period, count in zip(args.days, report.upcoming_counts(args.days)):
+        print(f"within {period} days: {count}")
+    for month, count in enumerate(report.per_month(), 1):
+        print(f"{month_name[month]:<10} {count}")
@@ -0,0 +1,106 @@
+import re
+from typing import Dict, List, Tuple
+from sqlalchemy import func, text
+from model import Addresses, Emails, Notes, Records, note_tags
+
+# Every indexed row is stored under rowid = id * KIND_SLOTS + kind code, so the triggers can
+# update and delete index rows by rowid instead of scanning the UNINDEXED columns.
+KIND_SLOTS = 8
+SOURCES = (("records", "name", 0), ("notes", "title", 1), ("tags", "title", 2),
+           ("addresses", "title", 3), ("emails", "title", 4))
+
+CREATE_INDEX = ("CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+                "body, kind UNINDEXED, ref_id UNINDEXED, prefix='2 3', tokenize='unicode61 remove_diacritics 2')")
+
+
+def _row(column: str, code: int, alias: str) -> Tuple[str, str]:
+    return f"{alias}.id * {KIND_SLOTS} + {code}", f"{alias}.{column}"
+
+
+def _triggers(table: str, column: str, code: int) -> List[str]:
+    new_rowid, new_body = _row(column, code, "new")
+    old_rowid, _ = _row(column, code, "old")
+    insert = (f"INSERT INTO search_index(rowid, body, kind, ref_id) "
+              f"VALUES ({new_rowid}, {new_body}, '{table}', new.id);")
+    delete = f"DELETE FROM search_index WHERE rowid = {old_rowid};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {column} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+
+
+def ddl() -> List[str]:
+    statements = [CREATE_INDEX]
+    for source in SOURCES:
+        statements += _triggers(*source)
+    return statements
+
+
+def reindex(connection, table: str) -> None:
+    """Recreate the triggers of one source table and refill its index rows, e.g. after the table was rebuilt"""
+    for _table, column, code in SOURCES:
+        if _table == table:
+            for statement in _triggers(table, column, code):
+                connection.execute(text(statement))
+            connection.execute(text("DELETE FROM search_index WHERE kind = :kind"), {"kind": table})
+            _fill(connection, table, column, code)
+
+
+def install(connection) -> None:
+    """Create the FTS5 index with its sync triggers and fill it from the existing rows"""
+    for statement in ddl():
+        connection.execute(text(statement))
+    connection.execute(text("DELETE FROM search_index"))
+    for source in SOURCES:
+        _fill(connection, *source)
+
+
+def _fill(connection, table: str, column: str, code: int) -> None:
+    rowid, body = _row(column, code, table)
+    connection.execute(text(f"INSERT INTO search_index(rowid, body, kind, ref_id) "
+                            f"SELECT {rowid}, {body}, '{table}', id FROM {table} WHERE {column} IS NOT NULL"))
+
+
+def uninstall(connection) -> None:
+    for table, _, _ in SOURCES:
+        for suffix in ("ai", "au", "ad"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_search_{suffix}"))
+    connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+
+def match_expression(query: str) -> str:
+    """Every word of the query as a quoted prefix term, all of them required"""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def _owners(session, kind: str, ids: List[int]) -> Dict[int, str]:
+    if kind == "records":
+        qs = session.query(Records.id, Records.name).filter(Records.id.in_(ids))
+    elif kind == "tags":
+        # a tag is shared by many notes, it is shown with the first contact that uses it
+        first_note = session.query(note_tags.c.tag_id, func.min(note_tags.c.note_id).label("note_id")) \
+            .filter(note_tags.c.tag_id.in_(ids)).group_by(note_tags.c.tag_id).subquery()
+        qs = session.query(first_note.c.tag_id, Records.name).join(Notes, Notes.id == first_note.c.note_id) \
+            .join(Records, Notes.records_id == Records.id)
+    else:
+        model = {"notes": Notes, "addresses": Addresses, "emails": Emails}[kind]
+        qs = session.query(model.id, Records.name).join(Records, model.records_id == Records.id) \
+            .filter(model.id.in_(ids))
+    return dict(qs.all())
+
+
+def search(session, query: str, limit: int = 20) -> List[Tuple[str, str, str]]:
+    """Ranked (contact name, kind, highlighted text) matches for every word prefix of `query`"""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    rows = session.execute(text("SELECT kind, ref_id, highlight(search_index, 0, '[', ']') FROM search_index "
+                                "WHERE search_index MATCH :query ORDER BY rank LIMIT :limit"),
+                           {"query": expression, "limit": limit}).all()
+    ids = {}
+    for kind, ref_id, _ in rows:
+        ids.setdefault(kind, []).append(ref_id)
+    owners = {kind: _owners(session, kind, kind_ids) for kind, kind_ids in ids.items()}
+    return [(owners[kind].get(ref_id, ""), kind, body) for kind, ref_id, body in rows]
@@ -0,0 +1,379 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import metrics
+from classifier import Classifier, load_categories
+from dedup import HASH_DB, Deduplicator, HashIndex
+
+
+WORKERS = min(32, (os.cpu_count() or 1) + 4)
+JOURNAL_NAME = '.sort_journal'
+# journals of the shards of a multi-process run, .sort_journal.<n>
+SHARD_JOURNAL = re.compile(re.escape(JOURNAL_NAME) + r'\.\d+')
+
+# A plan step is ("move", source, category, file name, None), ("link" or "drop", source, category,
+# file name, path of the identical kept file) or ("rmdir", folder, None, None, None).
+Step = Tuple[str, str, Optional[str], Optional[str], Optional[str]]
+
+
+def rename_exists_files(name):
+    return name + '_edit_' + datetime.now().strftime('%Y-%m-%d_%H-%M-%S.%f')
+
+
+def log(base_path, file_log, dry_run=False):
+    final_dict = {}
+    for i in file_log:
+        for k, v in i.items():
+            final_dict.setdefault(k, []).append(v)
+    for k, v in final_dict.items():
+        print(f'---{k}---')
+        print(', '.join(v))
+    if dry_run:
+        print(f"Dry run: nothing in the {base_path} catalog has been moved.")
+    else:
+        print(f"Sorting in the {base_path} catalog has been completed successfully.")
+
+
+def file_log_of(steps: Iterable[Step]) -> List[Dict[str, str]]:
+    file_log = []
+    for action, source, category, fname, _ in steps:
+        if action in ("move", "link"):
+            file_log.append({category: fname})
+        elif action == "drop":
+            file_log.append({'duplicates': os.path.basename(source)})
+    return file_log
+
+
+class FileSorter:
+    """Plans every move of a tree in one scandir pass without touching it,
+    then applies the plan from a journal that survives a crash.
+
+    Files are put in place with link() and unlink(), which fail rather than replace a file that
+    appeared under the planned name since the plan was written; the file then takes a new name.
+
+    A sorter given a `shard` only walks that top-level folder of the tree, or only the files lying
+    in base_path itself when the shard is base_path. Shards of one tree run in separate processes
+    and share the category folders.
+    """
+
+    def __init__(self, base_path: str, workers: int = WORKERS, journal_path: str = None,
+                 dedup: str = None, hash_db: str = HASH_DB, classifier: Classifier = None, shard: str = None):
+        self.base_path = base_path
+        self.workers = max(1, workers)
+        self.dedup = dedup
+        self.hash_db = hash_db
+        self.classifier = classifier or Classifier(cache_path=hash_db)
+        self.journal_path = journal_path or os.path.join(base_path, JOURNAL_NAME)
+        self.shard = shard
+        self._taken: Dict[str, set] = {}
+
+    def _destination(self, category: str, fname: str) -> str:
+        taken = self._taken.get(category)
+        if taken is None:
+            category_path = os.path.join(self.base_path, category)
+            taken = self._taken[category] = set(os.listdir(category_path)) if os.path.isdir(category_path) else set()
+        if fname in taken:
+            name, extension = os.path.splitext(fname)
+            fname = rename_exists_files(name) + extension
+            while fname in taken:
+                fname = rename_exists_files(name) + extension
+        taken.add(fname)
+        return fname
+
+    def _claim(self, target: str, category: str, fname: str) -> str:
+        """Hardlinks target into the category under fname, or under a new name when another process took
+        that one since the plan was made: link() never replaces a file. Returns the name used."""
+        name, extension = os.path.splitext(fname)
+        while True:
+            destination = os.path.join(self.base_path, category, fname)
+            try:
+                os.link(target, destination)
+                return fname
+            except FileExistsError:
+                # after a crash the link may already be in place
+                if os.path.samefile(target, destination):
+                    return fname
+                fname = rename_exists_files(name) + extension
+
+    def plan(self) -> Iterator[Step]:
+        """Moves in walk order followed by the folders to prune, children before parents"""
+        start = self.shard or self.base_path
+        folders = [start] if start != self.base_path else []
+        # the top-level folders of a sharded tree are walked by their own shards
+        descend = self.shard != self.base_path
+        stack = [start]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if descend and entry.name not in self.classifier.categories:
+                            stack.append(entry.path)
+                            folders.append(entry.path)
+                    elif entry.is_file() and not entry.name.startswith(JOURNAL_NAME):
+                        category = self.classifier.classify(entry.path, entry)
+                        if category:
+                            yield "move", entry.path, category, self._destination(category, entry.name), None
+        self.classifier.commit()
+        for path in reversed(folders):
+            yield "rmdir", path, None, None, None
+
+    def deduplicate(self, steps: Iterable[Step]) -> List[Step]:
+        index = HashIndex(self.hash_db)
+        try:
+            return Deduplicator(self.base_path, self.classifier.categories, self.dedup, index).apply(list(steps))
+        finally:
+            index.close()
+
+    def full_plan(self) -> Iterable[Step]:
+        return self.deduplicate(self.plan()) if self.dedup else self.plan()
+
+    def write_journal(self, steps: Iterable[Step]) -> None:
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as journal:
+            for step in steps:
+                journal.write(json.dumps(step, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.journal_path)
+
+    def read_journal(self) -> List[Step]:
+        with open(self.journal_path, encoding='utf-8') as journal:
+            return [tuple(json.loads(line)) for line in journal]
+
+    def _read_done(self) -> Dict[int, Optional[str]]:
+        """Indexes of the finished steps, with the file name a step had to change to"""
+        done = {}
+        try:
+            with open(self.journal_path + '.done', encoding='utf-8') as done_file:
+                for line in done_file:
+                    index, _, fname = line.rstrip('\n').partition('\t')
+                    if index.isdigit():
+                        done[int(index)] = fname or None
+        except FileNotFoundError:
+            pass
+        return done
+
+    def execute(self, prune: bool = True) -> List[Step]:
+        """Applies the journal, skipping steps finished by an earlier, interrupted run"""
+        steps = self.read_journal()
+        done = self._read_done()
+        renamed = {index: fname for index, fname in done.items() if fname}
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.workers * 64)
+
+        def finish(index: int, fname: str) -> None:
+            if fname != steps[index][3]:
+                renamed[index] = fname
+                done_file.write(f'{index}\t{fname}\n')
+            else:
+                done_file.write(f'{index}\n')
+
+        def move(index: int, source: str, category: str, fname: str) -> None:
+            try:
+                start = time.perf_counter()
+                # after a crash the marker may be missing although the file already moved
+                if os.path.exists(source):
+                    fname = self._put(source, source, category, fname)
+                metrics.observe("sorter_file", "move", time.perf_counter() - start)
+                with lock:
+                    finish(index, fname)
+            finally:
+                slots.release()
+
+        for category in {step[2] for step in steps if step[0] in ("move", "link")}:
+            os.makedirs(os.path.join(self.base_path, category), exist_ok=True)
+        with open(self.journal_path + '.done', 'a', encoding='utf-8') as done_file:
+            with metrics.measure("sorter", "move"), ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = []
+                for index, (action, source, category, fname, _) in enumerate(steps):
+                    if action == "move" and index not in done:
+                        slots.acquire()
+                        futures.append(pool.submit(move, index, source, category, fname))
+                for future in futures:
+                    future.result()
+            # kept copies that had to go under another name
+            moved = {}
+            for index, fname in renamed.items():
+                action, source, category, planned, kept = steps[index]
+                if action == "move":
+                    moved[os.path.join(self.base_path, category, planned)] = os.path.join(self.base_path, category,
+                                                                                         fname)
+                steps[index] = (action, source, category, fname, kept)
+            # duplicates go after the moves, which put the copies they point at in place
+            with metrics.measure("sorter", "duplicates"):
+                for index, (action, source, category, fname, kept) in enumerate(steps):
+                    if action in ("link", "drop") and index not in done and os.path.exists(source):
+                        kept = moved.get(kept, kept)
+                        if action == "drop":
+                            os.remove(source)
+                        else:
+                            fname = self._put(kept, source, category, fname)
+                            steps[index] = (action, source, category, fname, kept)
+                        finish(index, fname)
+        with metrics.measure("sorter", "prune"):
+            for action, path, _, _, _ in steps:
+                if action == "rmdir" and prune:
+                    try:
+                        os.rmdir(path)
+                    except OSError:
+                        pass
+        os.remove(self.journal_path + '.done')
+        os.remove(self.journal_path)
+        return steps
+
+    def _put(self, target: str, source: str, category: str, fname: str) -> str:
+        """Moves source into the category as a hardlink to target, which is source itself unless it is
+        a duplicate. Returns the file name used."""
+        try:
+            fname = self._claim(target, category, fname)
+        except OSError:
+            # another file system or no hardlink support: a plain move, to a name that is free right now
+            name, extension = os.path.splitext(fname)
+            while os.path.exists(os.path.join(self.base_path, category, fname)):
+                fname = rename_exists_files(name) + extension
+            shutil.move(source, os.path.join(self.base_path, category, fname))
+            return fname
+        os.remove(source)
+        return fname
+
+    def run(self) -> List[Dict[str, str]]:
+        if not os.path.exists(self.journal_path):
+            # the plan is a generator, so scanning, hashing and writing the journal are timed together
+            with metrics.measure("sorter", "plan"):
+                self.write_journal(self.full_plan())
+        return file_log_of(self.execute())
+
+
+def print_plan(base_path: str, steps: Iterable[Step]) -> None:
+    for action, path, category, fname, kept in steps:
+        if action == "move":
+            print(f"{path} -> {os.path.join(base_path, category, fname)}")
+        elif action == "link":
+            print(f"{path} -> {os.path.join(base_path, category, fname)} (hardlink to duplicate {kept})")
+        elif action == "drop":
+            print(f"remove {path} (duplicate of {kept})")
+        else:
+            print(f"remove empty folder {path}")
+
+
+def _sort_shard(base_path: str, shard: str, journal_path: str, workers: int, dedup: str, hash_db: str,
+                categories: Dict[str, tuple], sniff: bool) -> Dict[str, List[str]]:
+    """Sorts one shard in a worker process, returns the sorted file names per category"""
+    classifier = Classifier(categories, sniff, hash_db)
+    try:
+        file_log = FileSorter(base_path, workers, journal_path, dedup, hash_db, classifier, shard).run()
+    finally:
+        classifier.close()
+    result = {}
+    for item in file_log:
+        for category, fname in item.items():
+            result.setdefault(category, []).append(fname)
+    return result
+
+
+def sort_sharded(roots: List[str], processes: int, workers: int = WORKERS, dedup: str = None,
+                 hash_db: str = HASH_DB, classifier: Classifier = None) -> List[Dict[str, str]]:
+    """Sorts every root in a pool of processes, one shard per top-level folder plus one for the files
+    lying in the root itself. Duplicates are found within a shard and among the files already sorted."""
+    classifier = classifier or Classifier(cache_path=hash_db)
+    file_log, shards = [], []
+    for root in roots:
+        for name in sorted(os.listdir(root)):
+            if SHARD_JOURNAL.fullmatch(name):
+                print(f"Resuming the interrupted sorting from {os.path.join(root, name)}.")
+                sorter = FileSorter(root, workers, os.path.join(root, name), dedup, hash_db, classifier, root)
+                file_log += file_log_of(sorter.execute())
+        with os.scandir(root) as entries:
+            folders = sorted(entry.path for entry in entries
+                             if entry.is_dir(follow_symlinks=False) and entry.name not in classifier.categories)
+        shards += [(root, shard) for shard in [root] + folders]
+    with metrics.measure("sorter", "sharded"), ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_sort_shard, root, shard, os.path.join(root, f"{JOURNAL_NAME}.{index}"), workers,
+                               dedup, hash_db, dict(classifier.categories), classifier.sniff)
+                   for index, (root, shard) in enumerate(shards)]
+        # shards report as they finish, so the merged log never waits for the slowest one
+        for future in as_completed(futures):
+            for category, names in future.result().items():
+                file_log += [{category: fname} for fname in names]
+    return file_log
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sort_files", description="Sort files into category folders.")
+    parser.add_argument("path", nargs="+", help="one or more folders, each sorted into its own category folders")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="threads used for moving files, per process")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="sort the top-level folders of every path in this many processes")
+    parser.add_argument("--dry-run", action="store_true", help="print the planned moves without making them")
+    parser.add_argument("--journal", help=f"journal file, {JOURNAL_NAME} in the sorted folder by default")
+    parser.add_argument("--dedup", choices=("link", "drop"),
+                        help="hardlink or remove files whose content is already sorted")
+    parser.add_argument("--hash-db", default=HASH_DB,
+                        help="SQLite cache of file hashes used by --dedup and of the sniffed file types")
+    parser.add_argument("--categories", help="INI file whose [categories] section adds or replaces categories, "
+                                             "e.g. books = epub fb2")
+    parser.add_argument("--no-sniff", dest="sniff", action="store_false",
+                        help="sort by extension only, without reading the files the table does not know")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and sort new files as they arrive (Linux inotify)")
+    parser.add_argument("--debounce", type=float, default=0.5,
+                        help="seconds without new files before a watched batch is sorted")
+    return parser
+
+
+def sort_files_entry_point(path, workers: int = WORKERS, dry_run: bool = False, journal: str = None,
+                           dedup: str = None, hash_db: str = HASH_DB, watch: bool = False, debounce: float = 0.5,
+                           categories: str = None, sniff: bool = True, processes: int = 1):
+    roots = [path] if isinstance(path, str) else list(path)
+    if not all(os.path.exists(root) for root in roots):
+        print('Wrong path!')
+        return
+    if watch and len(roots) > 1:
+        print("Watch mode takes a single folder.")
+        return
+    try:
+        classifier = Classifier(load_categories(categories), sniff, hash_db)
+    except FileNotFoundError as e:
+        print(f"No categories file {e}.")
+        return
+    if processes > 1 and not (watch or dry_run):
+        log(', '.join(roots), sort_sharded(roots, processes, workers, dedup, hash_db, classifier))
+        classifier.close()
+        return
+    for root in roots:
+        _sort_root(FileSorter(root, workers, journal if len(roots) == 1 else None, dedup, hash_db, classifier),
+                   dry_run, watch, debounce)
+    classifier.close()
+
+
+def _sort_root(sorter: FileSorter, dry_run: bool, watch: bool, debounce: float) -> None:
+    path = sorter.base_path
+    if watch and not dry_run:
+        from watcher import Watcher
+        try:
+            watcher = Watcher(sorter, debounce)
+        except OSError as e:
+            print(f"Watch mode is not available: {e}")
+            return
+        watcher.run()
+        return
+    resume = os.path.exists(sorter.journal_path)
+    if dry_run:
+        steps = sorter.read_journal() if resume else list(sorter.full_plan())
+        print_plan(path, steps)
+        log(path, file_log_of(steps), dry_run=True)
+        return
+    if resume:
+        print(f"Resuming the interrupted sorting from {sorter.journal_path}.")
+    log(path, sorter.run())
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sort_files_entry_point(args.path, args.workers, args.dry_run, args.journal, args.dedup, args.hash_db, args.watch,
+                           args.debounce, args.categories, args.sniff, args.processes)
@@ -0,0 +1,88 @@
+"""Shared tags of notes.
+
+A tag title is stored once in `tags` and attached to notes through `note_tags`. Titles compare
+case-insensitively, and `usage_count` is maintained by the note_tags triggers, so the tag cloud
+and multi-tag lookups read indexes instead of grouping every tag row.
+"""
+import re
+from typing import Iterable, Iterator, List, Tuple
+from sqlalchemy.orm import aliased
+from model import Notes, Records, Tags, note_tags
+
+
+def normalize(title: str) -> str:
+    return re.sub(r"\s+", " ", str(title)).strip()
+
+
+def titles_of(value) -> List[str]:
+    """Distinct non-empty titles from a list or a ";"/","-separated string, first spelling wins"""
+    items = re.split(r"[;,]", value) if isinstance(value, str) else value
+    titles = {}
+    for item in map(normalize, items):
+        if item:
+            titles.setdefault(item.lower(), item)
+    return list(titles.values())
+
+
+def get_or_create(session, titles: Iterable[str]) -> List[Tags]:
+    titles = titles_of(list(titles))
+    existing = {i.title.lower(): i for i in session.query(Tags).filter(Tags.title.in_(titles))}
+    result = []
+    for title in titles:
+        tag = existing.get(title.lower())
+        if tag is None:
+            tag = Tags(title=title)
+            session.add(tag)
+        result.append(tag)
+    return result
+
+
+def tag_note(session, note: Notes, titles: Iterable[str]) -> List[Tags]:
+    """Attaches the tags to the note, creating the ones that do not exist yet"""
+    tags = get_or_create(session, titles)
+    for tag in tags:
+        if tag not in note.tags:
+            note.tags.append(tag)
+    session.flush()
+    return tags
+
+
+def notes_with_tags(session, titles: Iterable[str], match_all: bool = True, after_id: int = 0, limit: int = 100):
+    """Keyset page of (note id, note title, contact name) carrying all (or any) of the tags.
+
+    For all tags the lookup starts from the rarest tag and probes the note_tags primary key for
+    the others, so its cost follows the least used tag, not the most popular one.
+    """
+    titles = titles_of(list(titles))
+    tags = session.query(Tags.id).filter(Tags.title.in_(titles)).order_by(Tags.usage_count).all()
+    if not tags or (match_all and len(tags) < len(titles)):
+        return []
+    if match_all:
+        qs = session.query(note_tags.c.note_id).filter(note_tags.c.tag_id == tags[0].id)
+        for tag in tags[1:]:
+            other = aliased(note_tags)
+            qs = qs.join(other, (other.c.note_id == note_tags.c.note_id) & (other.c.tag_id == tag.id))
+    else:
+        qs = session.query(note_tags.c.note_id).filter(note_tags.c.tag_id.in_([i.id for i in tags])).distinct()
+    matched = qs.filter(note_tags.c.note_id > int(after_id)).subquery()
+    return session.query(Notes.id, Notes.title, Records.name).join(matched, Notes.id == matched.c.note_id) \
+        .join(Records, Notes.records_id == Records.id).order_by(Notes.id).limit(int(limit)).all()
+
+
+def iter_notes_with_tags(session, titles: Iterable[str], match_all: bool = True,
+                         page_size: int = 100) -> Iterator[List[Tuple[int, str, str]]]:
+    """Every page of notes_with_tags, the last one is the first that comes back short"""
+    titles, after_id = list(titles), 0
+    while True:
+        page = notes_with_tags(session, titles, match_all, after_id, page_size)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
+
+def tag_cloud(session, limit: int = 50) -> List[Tuple[str, int]]:
+    """Most used tags with their note counts, read in order from ix_tags_usage_count"""
+    return session.query(Tags.title, Tags.usage_count).filter(Tags.usage_count > 0) \
+        .order_by(Tags.usage_count.desc(), Tags.title).limit(int(limit)).all()
@@ -0,0 +1,38 @@
+import builtins
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """The address book engine on a fresh database migrated to head"""
+    from alembic import command
+    from alembic.config import Config
+    import fuzzy
+    import model
+    url = f"sqlite:///{tmp_path / 'address_book.db'}"
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+    monkeypatch.setattr(model, "DB_URL", url)
+    monkeypatch.setattr(model, "_engine", None)
+    fuzzy.reset_index()
+    model.session.remove()
+    yield model.get_engine()
+    model.session.remove()
+    model.get_engine().dispose()
+    fuzzy.reset_index()
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Replies to input() prompts, append them before running a command"""
+    replies = []
+    monkeypatch.setattr(builtins, "input", lambda prompt="": replies.pop(0))
+    return replies
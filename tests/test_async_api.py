@@ -0,0 +1,33 @@
+import asyncio
+import json
+
+
+def test_a_failing_request_keeps_the_connection(engine, tmp_path, monkeypatch):
+    import async_api
+    import model
+    import operations
+
+    def broken(session, name: str):
+        raise AttributeError("broken")
+
+    monkeypatch.setitem(operations.OPERATIONS, "find_contact", broken)
+
+    async def session():
+        service = async_api.AddressBookService(async_api.create_engine(model.DB_URL))
+        server = await async_api.serve(service, str(tmp_path / "book.sock"))
+        reader, writer = await asyncio.open_unix_connection(str(tmp_path / "book.sock"))
+        responses = []
+        for request in ({"command": "find_contact", "args": {"name": "anna"}}, [1], "{",
+                        {"command": "add_contact", "args": {"name": "anna"}}):
+            writer.write((request if isinstance(request, str) else json.dumps(request)).encode() + b"\n")
+            await writer.drain()
+            responses.append(json.loads(await reader.readline()))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        await service.close()
+        return responses
+
+    responses = asyncio.run(session())
+    assert [i["ok"] for i in responses] == [False, False, False, True]
+    assert responses[0]["error"] == "AttributeError: broken"
@@ -0,0 +1,55 @@
+import io
+import json
+
+
+def test_bad_script_lines_are_reported_and_skipped(engine):
+    from batch import read_script, run_batch
+    from model import session
+    script = ['{"command": "add_contact", "args": {"name": "anna"}}', '{"command": "add_note", '
+              '"args": {"name": "anna", "note": "call back"}}', "not json", '{"args": {}}', "[1]",
+              '{"command": "print_notes", "args": {"name": "anna"}}']
+    out = io.StringIO()
+    assert not run_batch(session, read_script(script), out)
+    lines = [json.loads(i) for i in out.getvalue().splitlines()]
+    assert [i["ok"] for i in lines] == [True, True, False, False, False, True]
+    assert lines[2]["error"].startswith("Line 3") and lines[3]["error"] == "Line 4 has no command"
+    assert lines[-1]["result"] == [{"id": 1, "title": "call back"}]
+    session.remove()
+
+
+def test_database_error_is_reported_on_its_own_line(engine):
+    from batch import run_batch
+    from model import session
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE phones")
+    out = io.StringIO()
+    assert not run_batch(session, [("add_contact", {"name": "anna", "phones": "0501234567"})], out)
+    line = json.loads(out.getvalue())
+    assert not line["ok"] and "phones" in line["error"]
+    session.remove()
+
+
+def test_arguments_are_coerced_and_unexpected_errors_reported(engine, monkeypatch):
+    import operations
+    from batch import parse_argv, run_batch
+    from model import session
+    out = io.StringIO()
+    assert not run_batch(session, [("add_contact", {"name": "anna"}), parse_argv(["add_note", "name=anna", "note=5"]),
+                                   parse_argv(["del_note", "note_id=first"])], out)
+    lines = [json.loads(i) for i in out.getvalue().splitlines()]
+    assert lines[1]["result"]["title"] == "5"
+    assert lines[2] == {"command": "del_note", "ok": False,
+                        "error": "Wrong arguments for del_note: note_id is not a valid int"}
+
+    def broken(session, name: str):
+        raise AttributeError("broken")
+
+    monkeypatch.setitem(operations.OPERATIONS, "find_contact", broken)
+    out = io.StringIO()
+    assert not run_batch(session, [("add_contact", {"name": "bob"}), ("find_contact", {"name": "bob"}),
+                                   ("add_contact", {"name": "carl"})], out)
+    lines = [json.loads(i) for i in out.getvalue().splitlines()]
+    assert [i["ok"] for i in lines] == [False, False, True]
+    assert lines[0]["error"] == "Batch rolled back: AttributeError: broken"
+    assert operations.find_contact(session, "carl")["name"] == "Carl"
+    session.remove()
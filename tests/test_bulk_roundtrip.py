@@ -0,0 +1,68 @@
+"""Export followed by import gives back the same contacts in every format, separators and
+vCard escapes included."""
+import pytest
+
+CONTACT = {"name": "O'neil, jr; the second", "birthday": "01.02.1990", "phones": ["+380501234567", "+380671234567"],
+           "emails": ["oneil@mail.com"], "addresses": ["Main st, 5; apt 3", "C:\\home"],
+           "notes": ["call; then write", "two\nlines, with a \\ backslash"]}
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl", "vcf"])
+def test_export_import_round_trip(engine, tmp_path, fmt):
+    from bulk import export_contacts, import_contacts
+    from model import Records, unit_of_work
+    from operations import add_contact, find_contact
+    with unit_of_work() as session:
+        add_contact(session, **CONTACT)
+        path = str(tmp_path / f"contacts.{fmt}")
+        assert export_contacts(session, path) == 1
+        session.delete(session.query(Records).one())
+    with unit_of_work() as session:
+        imported, rejected, _ = import_contacts(session, path)
+    assert (imported, rejected) == (1, 0)
+    with unit_of_work() as session:
+        contact = find_contact(session, CONTACT["name"])
+    assert contact["name"] == CONTACT["name"].capitalize()
+    assert contact["birthday"] == CONTACT["birthday"]
+    for field in ("phones", "emails", "addresses"):
+        assert contact[field] == CONTACT[field]
+    assert [i["title"] for i in contact["notes"]] == CONTACT["notes"]
+
+
+def test_csv_typed_by_hand_splits_on_separator(tmp_path):
+    from bulk import read_csv
+    path = tmp_path / "contacts.csv"
+    path.write_text("name,birthday,phones,emails,addresses,notes\nanna,,050 123 45 67;067 123 45 67,,,[draft] note\n",
+                    encoding="utf-8")
+    with open(path, encoding="utf-8", newline="") as f:
+        row = next(read_csv(f))
+    assert row["phones"] == "050 123 45 67;067 123 45 67"
+    assert row["notes"] == "[draft] note"
+
+
+def test_import_takes_ids_from_the_database(engine, tmp_path):
+    import json
+    from sqlalchemy import event
+    from bulk import import_contacts
+    from model import Records, unit_of_work
+    path = tmp_path / "contacts.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(2000):
+            f.write(json.dumps({"name": f"contact{i}", "phones": [f"+38050{i:07d}"]}) + "\n")
+    writers = []
+
+    def other_writer(conn, cursor, statement, parameters, context, executemany):
+        # another process adds a contact between the duplicate check and the insert
+        if statement.startswith("INSERT INTO records") and not writers:
+            writers.append(cursor.connection.execute("INSERT INTO records (name) VALUES ('Meanwhile')").lastrowid)
+
+    event.listen(engine, "before_cursor_execute", other_writer)
+    try:
+        with unit_of_work() as session:
+            assert import_contacts(session, str(path), batch_size=2000)[:2] == (2000, 0)
+    finally:
+        event.remove(engine, "before_cursor_execute", other_writer)
+    with unit_of_work() as session:
+        assert session.query(Records).count() == 2001
+        record = session.query(Records).filter(Records.name == "Contact1999").one()
+        assert [i.number for i in record.phones] == ["+380500001999"]
@@ -0,0 +1,38 @@
+import pytest
+
+
+def ftyp(brand: bytes) -> bytes:
+    return b"\x00\x00\x00\x18ftyp" + brand + b"\x00\x00\x00\x00isommp42"
+
+
+@pytest.mark.parametrize("header, extension", [
+    (ftyp(b"isom"), "MP4"),
+    (ftyp(b"mp42"), "MP4"),
+    (ftyp(b"M4V "), "MP4"),
+    (ftyp(b"qt  "), "MOV"),
+    (ftyp(b"M4A "), "M4A"),
+    (ftyp(b"heic"), "HEIC"),
+    (ftyp(b"avif"), "AVIF"),
+    (ftyp(b"crx "), None),
+    (b'<svg xmlns="http://www.w3.org/2000/svg"/>', "SVG"),
+    (b'\xef\xbb\xbf<?xml version="1.0"?>\n<!-- logo -->\n<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" '
+     b'"http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n<svg>', "SVG"),
+    (b'<?xml version="1.0"?><html><body><svg></svg></body></html>', None),
+    (b"<p>an inline <svg> in a fragment</p>", None),
+    (b"<svgfont/>", None),
+])
+def test_sniff(header, extension):
+    from classifier import sniff
+    assert sniff(header) == extension
+
+
+def test_heif_images_stay_out_of_video(tmp_path):
+    from classifier import Classifier
+    path = tmp_path / "IMG_0001"
+    path.write_bytes(ftyp(b"heic"))
+    classifier = Classifier(cache_path=str(tmp_path / "types.db"))
+    assert classifier.classify(str(path)) is None
+    classifier.close()
+    classifier = Classifier({"images": ("JPG", "HEIC"), "video": ("MP4",)}, cache_path=str(tmp_path / "types.db"))
+    assert classifier.classify(str(path)) == "images"
+    classifier.close()
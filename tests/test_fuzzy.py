@@ -0,0 +1,64 @@
+def test_remove_and_rename_drop_their_postings():
+    from fuzzy import TrigramIndex, trigrams
+    index = TrigramIndex.build([(1, "Anna"), (2, "Annette")])
+    index.add(1, "Bob")
+    index.remove(2)
+    assert set(index.postings) == trigrams("Bob")
+    assert all(list(posting) == [1] for posting in index.postings.values())
+    assert index.suggest("Bobb") and not index.suggest("Anette")
+
+
+def test_warm_builds_the_index_and_keeps_later_commits(engine):
+    import fuzzy
+    import operations
+    from model import session
+    operations.add_contact(session, "anna")
+    session.commit()
+    fuzzy.warm().join()
+    operations.add_contact(session, "annette")
+    session.commit()
+    assert sorted(fuzzy.get_index(session).names.values()) == ["Anna", "Annette"]
+    assert fuzzy.suggest(session, "anette")[0] == "Annette"
+    session.remove()
+
+
+def test_lookup_does_not_wait_for_a_running_build(engine):
+    import fuzzy
+    from model import session
+    with fuzzy._build_lock:
+        assert fuzzy.suggest(session, "anette") == []
+    session.remove()
+
+
+def test_concurrent_misspelled_lookups_in_the_service(engine):
+    import asyncio
+    import threading
+    import async_api
+    import model
+    from operations import OperationError
+    with engine.begin() as connection:
+        connection.execute(model.Records.__table__.insert(), [{"name": f"Contact{i}"} for i in range(30000)])
+
+    async def lookups():
+        service = async_api.AddressBookService(async_api.create_engine(model.DB_URL))
+
+        async def misspelled(number):
+            try:
+                await service.find_contact(f"Cnotact{number}")
+            except OperationError as e:
+                return str(e)
+
+        try:
+            # the first builds the index inside run_sync, the second must not wait for it on the loop thread
+            errors.extend(await asyncio.gather(misspelled(1), misspelled(2)))
+        finally:
+            await service.close()
+
+    errors = []
+    # a blocked event loop never lets asyncio.wait_for fire, so the loop runs on a thread that may be given up on
+    loop = threading.Thread(target=asyncio.run, args=(lookups(),), daemon=True)
+    loop.start()
+    loop.join(30)
+    assert not loop.is_alive(), "the lookups deadlocked"
+    assert len(errors) == 2 and all(error.startswith("There is no contact") for error in errors)
+    assert any("Did you mean: Contact1" in error for error in errors)
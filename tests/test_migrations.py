@@ -0,0 +1,28 @@
+import os
+import sqlite3
+
+from conftest import ROOT
+
+
+def test_typed_columns_keep_what_can_be_told(tmp_path):
+    from alembic import command
+    from alembic.config import Config
+    path = tmp_path / "address_book.db"
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+    command.upgrade(config, "e46c86a9bb74")
+    with sqlite3.connect(path) as connection:
+        connection.executemany("INSERT INTO records (name, birthday) VALUES (?, ?)",
+                               [("Anna", "1.2.1990"), ("Bob", "01.02.1990"), ("Carl", "31.02.1990"), ("Dana", "soon"),
+                                ("Eve", None)])
+        # the INTEGER column keeps "+" and leading zeros off what it converts
+        connection.executemany("INSERT INTO phones (number, records_id) VALUES (?, 1)",
+                               [("+380501234567",), ("0000501234567",), ("0050123456789",), ("050-123-4567",)])
+    command.upgrade(config, "5cb717c08015")
+    with sqlite3.connect(path) as connection:
+        rows = connection.execute("SELECT name, birthday, birthday_day FROM records ORDER BY name").fetchall()
+        phones = [i for i, in connection.execute("SELECT number FROM phones ORDER BY id")]
+    assert rows == [("Anna", "1990-02-01", 201), ("Bob", "1990-02-01", 201), ("Carl", None, None),
+                    ("Dana", None, None), ("Eve", None, None)]
+    assert phones == ["+380501234567", "501234567", "50123456789", "+380501234567"]
@@ -0,0 +1,35 @@
+from datetime import date
+
+import pytest
+
+
+def test_edit_contact_deletes_the_replaced_rows(engine):
+    import operations
+    from model import Addresses, Emails, Phones, session
+    operations.add_contact(session, "anna", phones=["0501234567"], emails=["ab@old.com"], addresses=["old street"])
+    session.commit()
+    operations.edit_contact(session, "anna", phones="0507654321", emails="cd@new.com", addresses="new street")
+    session.commit()
+    assert [i.number for i in session.query(Phones)] == ["+380507654321"]
+    assert [i.title for i in session.query(Emails)] == ["cd@new.com"]
+    assert [i.title for i in session.query(Addresses)] == ["new street"]
+    assert session.query(Phones).filter(Phones.records_id.is_(None)).count() == 0
+    assert operations.search(session, "ab") == []
+    assert operations.search(session, "old") == []
+    assert [(i["name"], i["text"]) for i in operations.search(session, "cd")] == [("Anna", "[cd]@new.com")]
+    session.remove()
+
+
+def test_negative_birthday_period_is_rejected(engine):
+    import operations
+    from model import session
+    from queries import upcoming_birthdays
+    operations.add_contact(session, "anna", "01.02.1990")
+    operations.add_contact(session, "bob", "30.12.1990")
+    session.commit()
+    assert upcoming_birthdays(session, 5, date(2026, 12, 28)) == ["Bob"]
+    with pytest.raises(ValueError):
+        upcoming_birthdays(session, -5, date(2026, 12, 28))
+    with pytest.raises(operations.OperationError):
+        operations.holidays_period(session, -5)
+    session.remove()
@@ -0,0 +1,84 @@
+"""Statements per read command stay the same however many contacts and child rows there are,
+so a command that starts loading collections row by row (N+1) fails here."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# contact graph: the record plus one SELECT per collection
+GRAPH = 5
+
+
+@contextmanager
+def statements_of(engine):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+
+def populate(contacts: int) -> None:
+    from model import unit_of_work
+    from operations import add_contact
+    with unit_of_work() as session:
+        for i in range(contacts):
+            add_contact(session, f"contact{i}", "01.02.1990", phones=[f"+38050{i:07d}", f"+38067{i:07d}"],
+                        emails=[f"user{i}@mail.com", f"other{i}@mail.com"], addresses=[f"street {i}", "city"],
+                        notes=[f"note {i}", "second", "third"])
+
+
+def run(engine, book, command: str):
+    from model import unit_of_work
+    with statements_of(engine) as statements, unit_of_work():
+        getattr(book, command)()
+    return len(statements)
+
+
+@pytest.fixture
+def book(monkeypatch):
+    import address_book
+    monkeypatch.setattr(address_book, "pick_row", lambda query, title, indicator="=>": query.first())
+    # the edit menu is left right away
+    monkeypatch.setattr(address_book, "pick", lambda options, *args, **kwargs: (options[-1], len(options) - 1))
+    return address_book.AddressBook()
+
+
+@pytest.mark.parametrize("contacts", [1, 50])
+@pytest.mark.parametrize("command, expected", [
+    ("find_contact", GRAPH),
+    ("print_notes", GRAPH),
+    # the first record of the menu query, then its graph
+    ("edit_record", 1 + GRAPH),
+])
+def test_contact_commands(engine, book, answers, contacts, command, expected):
+    populate(contacts)
+    answers.append("contact0")
+    assert run(engine, book, command) == expected
+
+
+@pytest.mark.parametrize("contacts", [1, 50])
+def test_show_contacts(engine, book, contacts):
+    populate(contacts)
+    # one page of records with a SELECT per collection, then the empty page that ends the listing
+    assert run(engine, book, "show_contacts") == GRAPH + 1
+
+
+@pytest.mark.parametrize("contacts", [1, 50])
+@pytest.mark.parametrize("command, args", [
+    ("find_contact", {"name": "contact0"}),
+    ("print_notes", {"name": "contact0"}),
+    ("show_contacts", {}),
+])
+def test_operations(engine, contacts, command, args):
+    import operations
+    from model import unit_of_work
+    populate(contacts)
+    with statements_of(engine) as statements, unit_of_work() as session:
+        operations.run(session, command, args)
+    assert len(statements) == GRAPH
@@ -0,0 +1,126 @@
+"""Every SELECT a command issues reads its tables through an index: EXPLAIN QUERY PLAN of the
+statements captured while the command runs may search a table or walk an index, never scan it."""
+import re
+
+import pytest
+from sqlalchemy import event, text
+
+CHILD_TABLES = ("phones", "emails", "addresses", "notes")
+# the child rows ON DELETE CASCADE looks up when a record or a note is deleted
+CASCADE_LOOKUPS = [f"SELECT id FROM {table} WHERE records_id = 1" for table in CHILD_TABLES] + \
+                  ["SELECT tag_id FROM note_tags WHERE note_id = 1", "SELECT note_id FROM note_tags WHERE tag_id = 1"]
+FULL_SCAN = re.compile(r"SCAN (\w+)(?! USING (COVERING )?INDEX)")
+
+
+def full_scans(connection, statement: str, parameters=()):
+    tables = {i for i, in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    # scans of subqueries and CTEs are fine, they are no tables
+    return [detail for *_, detail in plan
+            if FULL_SCAN.match(detail) and FULL_SCAN.match(detail).group(1) in tables]
+
+
+@pytest.fixture
+def book(engine, monkeypatch):
+    import address_book
+    from picker import QueryPicker
+    from model import unit_of_work
+    from operations import add_contact
+    with unit_of_work() as session:
+        for i in range(20):
+            add_contact(session, f"contact{i}", "01.02.1990", phones=[f"+38050{i:07d}"], emails=[f"user{i}@mail.com"],
+                        addresses=[f"street {i}"], notes=[f"note {i}", "second"])
+
+    def pick_row(query, title, indicator="=>"):
+        # the first screen of the real menu query
+        picker = QueryPicker(query, title, indicator)
+        picker.load()
+        return picker.selected()
+
+    monkeypatch.setattr(address_book, "pick_row", pick_row)
+    monkeypatch.setattr(address_book, "pick", lambda options, *args, **kwargs: (options[-1], len(options) - 1))
+    return address_book.AddressBook()
+
+
+@pytest.mark.parametrize("command, replies", [
+    ("find_contact", ["contact1"]),
+    ("print_notes", ["contact1"]),
+    ("add_note", ["contact1", "third"]),
+    ("del_note", ["contact1"]),
+    ("add_tags", ["contact1", "work; home"]),
+    ("find_sort_note", ["work"]),
+    ("find_notes_by_tags", ["work; home", "any"]),
+    ("tag_cloud", []),
+    ("holidays_period", ["30"]),
+    ("edit_record", []),
+    ("del_contact", ["contact2"]),
+    ("show_contacts", []),
+])
+def test_command_queries_use_indexes(engine, book, answers, command, replies):
+    from model import unit_of_work
+    # tags to look up
+    answers += ["contact3", "work; home"]
+    with unit_of_work():
+        book.add_tags()
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    answers += replies
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with unit_of_work():
+            getattr(book, command)()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert captured
+    with engine.connect() as connection:
+        for statement, parameters in captured:
+            assert not full_scans(connection, statement, parameters), statement
+
+
+@pytest.mark.parametrize("statement", CASCADE_LOOKUPS)
+def test_cascade_lookups_use_indexes(engine, statement):
+    with engine.connect() as connection:
+        plan = " ".join(detail for *_, detail in connection.execute(text(f"EXPLAIN QUERY PLAN {statement}")))
+        assert "USING" in plan and not full_scans(connection, statement), plan
+
+
+def test_name_lookups_use_indexes(engine):
+    with engine.connect() as connection:
+        for statement in ("SELECT id FROM records WHERE name = 'Anna'",
+                          "SELECT id FROM records WHERE name = 'Anna' COLLATE NOCASE",
+                          "SELECT id FROM tags WHERE title = 'work'"):
+            plan = " ".join(detail for *_, detail in connection.execute(text(f"EXPLAIN QUERY PLAN {statement}")))
+            assert "INDEX" in plan, plan
+
+
+def test_menu_pages_search_the_name_index(engine):
+    from picker import QueryPicker
+    from model import Records, session, unit_of_work
+    from operations import add_contact
+    with unit_of_work() as s:
+        for i in range(50):
+            add_contact(s, f"contact{i:02d}")
+    picker = QueryPicker(session.query(Records.name, Records.id), "Contacts", page_size=10)
+    picker.load()
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        picker.next_page()
+        picker.next_page()
+        picker.prev_page()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert [row[0] for row in picker.rows] == [f"Contact{i:02d}" for i in range(10, 20)]
+    with engine.connect() as connection:
+        for statement, parameters in captured:
+            plan = " ".join(d for *_, d in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            assert plan.startswith("SEARCH records USING COVERING INDEX uq_records_name_nocase"), plan
+    session.remove()
@@ -0,0 +1,34 @@
+NOTES = 250
+
+
+def tagged_notes(session):
+    from operations import add_contact, add_note, add_tag
+    add_contact(session, "anna")
+    for i in range(NOTES):
+        note = add_note(session, "anna", f"note {i:03d}")
+        add_tag(session, note["id"], "work")
+        if i % 2:
+            add_tag(session, note["id"], "home")
+    session.commit()
+
+
+def test_tag_lookups_read_every_page(engine, answers, capsys):
+    import address_book
+    from model import session, unit_of_work
+    from operations import find_note
+    from tags import iter_notes_with_tags
+    tagged_notes(session)
+    assert len(find_note(session, "work")) == NOTES
+    pages = list(iter_notes_with_tags(session, ["work", "home"], page_size=NOTES // 2))
+    assert [len(page) for page in pages] == [NOTES // 2]
+    assert [len(page) for page in iter_notes_with_tags(session, ["work"], page_size=NOTES // 2)] == [125, 125]
+    session.remove()
+    book = address_book.AddressBook()
+    answers += ["work"]
+    with unit_of_work():
+        book.find_sort_note()
+    assert len(capsys.readouterr().out.splitlines()) == NOTES
+    answers += ["home; work", "all"]
+    with unit_of_work():
+        book.find_notes_by_tags()
+    assert len(capsys.readouterr().out.splitlines()) == NOTES // 2
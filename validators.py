@@ -0,0 +1,55 @@
+import re
+from datetime import date, datetime
+
+
+class InvalidPhoneNumber(Exception):
+    """Exception in case of incorrect phone number input"""
+
+
+class InvalidEmailAddress(Exception):
+    """Exception in case of incorrect E-mail input"""
+
+
+class InvalidBirthday(Exception):
+    """Exception in case of incorrect Birthday input"""
+
+
+EMAIL_PATTERN = re.compile(r"[a-z][a-z|\d._]{1,}@[a-z]{1,}\.\w{2,}", re.IGNORECASE)
+E164_PATTERN = re.compile(r"\+[1-9]\d{7,14}")
+PHONE_SEPARATORS = re.compile(r"[\s\-().]")
+# national numbers, which start with the trunk prefix 0, belong to this country
+DEFAULT_COUNTRY_CODE = "380"
+BIRTHDAY_FORMAT = "%d.%m.%Y"
+
+
+def phone_valid(value: str) -> str:
+    """The number in E.164 form: "050 123-45-67" and "00380501234567" both give +380501234567"""
+    number = PHONE_SEPARATORS.sub("", str(value))
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    elif number.startswith("0"):
+        number = "+" + DEFAULT_COUNTRY_CODE + number[1:]
+    elif number.startswith(DEFAULT_COUNTRY_CODE):
+        number = "+" + number
+    if E164_PATTERN.fullmatch(number):
+        return number
+    raise InvalidPhoneNumber
+
+
+def email_valid(value: str) -> str:
+    if EMAIL_PATTERN.match(value):
+        return value
+    raise InvalidEmailAddress
+
+
+def birthday_valid(value: str) -> date:
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value.strip(), BIRTHDAY_FORMAT).date()
+    except (AttributeError, ValueError):
+        raise InvalidBirthday
+
+
+def birthday_text(birthday: date) -> str:
+    return birthday.strftime(BIRTHDAY_FORMAT) if birthday else ""
@@ -0,0 +1,268 @@
+"""Watch mode of the sorter: inotify tells which files arrived, only those are classified and moved.
+
+Every folder of the tree except the category folders gets an inotify watch (ctypes, Linux only).
+A file is taken once it is closed after writing or moved in, events are collected until the tree
+has been quiet for the debounce interval and then sorted as one journaled batch. The checkpoint
+file keeps the mtime of every watched folder and the files still open for writing, so a restart,
+or an overflowed event queue, only lists the folders that changed since.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterator, List, Set, Tuple
+import metrics
+from sorter import FileSorter, file_log_of, log
+
+CHECKPOINT_NAME = '.sort_watch'
+DEBOUNCE = 0.5
+# a steady stream of files is still sorted at least this often
+MAX_DELAY = 5.0
+MAX_BATCH = 1000
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+              | IN_ONLYDIR | IN_DONT_FOLLOW)
+EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimal inotify binding: watches, a pollable descriptor and decoded (wd, mask, name) events"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this system")
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(WATCH_MASK))
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> Iterator[Tuple[int, int, str]]:
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+                offset += EVENT.size + length
+                yield wd, mask, os.fsdecode(name)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Watcher:
+
+    def __init__(self, sorter: FileSorter, debounce: float = DEBOUNCE, checkpoint_path: str = None):
+        self.sorter = sorter
+        self.base_path = sorter.base_path
+        self.categories = sorter.classifier.categories
+        self.debounce = debounce
+        self.checkpoint_path = checkpoint_path or os.path.join(self.base_path, CHECKPOINT_NAME)
+        # the files the sorter writes itself would otherwise wake it up again after every batch
+        self.own = {os.path.abspath(path + suffix)
+                    for path in (self.checkpoint_path, sorter.journal_path, sorter.hash_db)
+                    for suffix in ('', '.tmp', '.done', '-journal', '-wal', '-shm')}
+        self.inotify = Inotify()
+        self.watches: Dict[int, str] = {}
+        self.watched: Set[str] = set()
+        # folder -> st_mtime_ns taken right before it was last listed, the checkpoint
+        self.mtimes: Dict[str, int] = {}
+        self.writing: Set[str] = set()
+        self.pending: Dict[str, float] = {}
+        self.first_pending = 0.0
+
+    def load_checkpoint(self) -> bool:
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+                data = json.load(checkpoint)
+        except (FileNotFoundError, ValueError):
+            return False
+        self.mtimes = data.get("mtimes", {})
+        self.writing = set(data.get("writing", []))
+        return True
+
+    def save_checkpoint(self) -> None:
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as checkpoint:
+            json.dump({"mtimes": self.mtimes, "writing": sorted(self.writing)}, checkpoint)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _watch(self, path: str) -> None:
+        try:
+            self.watches[self.inotify.add_watch(path)] = path
+            self.watched.add(path)
+        except OSError:
+            # the folder is gone again, its parent's events will tell if it comes back
+            pass
+
+    def _add(self, path: str) -> None:
+        if path not in self.pending and os.path.abspath(path) not in self.own:
+            self.pending[path] = time.monotonic()
+            self.first_pending = self.first_pending or self.pending[path]
+
+    def reconcile(self, path: str = None) -> None:
+        """Watches the folders under `path` and queues the files of those whose mtime
+        differs from the checkpoint; unchanged folders are only stat-ed, not listed"""
+        children = {}
+        for known in self.mtimes:
+            children.setdefault(os.path.dirname(known), []).append(known)
+        stack = [path or self.base_path]
+        while stack:
+            folder = stack.pop()
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                self._forget(folder)
+                continue
+            if folder not in self.watched:
+                self._watch(folder)
+            if self.mtimes.get(folder) == mtime:
+                stack += children.get(folder, [])
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.categories:
+                            stack.append(entry.path)
+                    elif entry.is_file() and entry.path not in self.writing:
+                        self._add(entry.path)
+            self.mtimes[folder] = mtime
+
+    def _forget(self, folder: str) -> None:
+        prefix = folder + os.sep
+        for path in [i for i in self.mtimes if i == folder or i.startswith(prefix)]:
+            del self.mtimes[path]
+        for wd, path in list(self.watches.items()):
+            if path == folder or path.startswith(prefix):
+                self.inotify.rm_watch(wd)
+                del self.watches[wd]
+                self.watched.discard(path)
+
+    def handle(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            # events were lost: fall back to comparing folder mtimes with the checkpoint
+            self.reconcile()
+            return
+        folder = self.watches.get(wd)
+        if folder is None:
+            return
+        if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+            self._forget(folder)
+            return
+        path = os.path.join(folder, name)
+        if os.path.abspath(path) in self.own:
+            return
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO) and name not in self.categories:
+                # files may land before the watch on the new folder exists, so it is listed once
+                self.reconcile(path)
+            elif mask & IN_MOVED_FROM:
+                self._forget(path)
+        elif mask & IN_CREATE:
+            self.writing.add(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.writing.discard(path)
+            self._add(path)
+        elif mask & IN_MOVED_FROM:
+            self.writing.discard(path)
+            self.pending.pop(path, None)
+
+    def due(self, now: float) -> bool:
+        if not self.pending:
+            return False
+        last = max(self.pending.values())
+        return (now - last >= self.debounce or now - self.first_pending >= MAX_DELAY
+                or len(self.pending) >= MAX_BATCH)
+
+    def timeout(self, now: float):
+        """Seconds until the pending batch is due, None to sleep until the next event"""
+        if not self.pending:
+            return None
+        last = max(self.pending.values())
+        return max(0.0, min(last + self.debounce, self.first_pending + MAX_DELAY) - now)
+
+    def flush(self) -> List[Dict[str, str]]:
+        """Sorts the pending files as one journaled batch.
+
+        The checkpoint keeps the folder mtimes from before the moves: an event lost in the
+        meantime still shows as a changed mtime, at the price of listing those folders again.
+        """
+        paths, self.pending, self.first_pending = sorted(self.pending), {}, 0.0
+        # files may have been added to the category folders since the last batch
+        self.sorter._taken = {}
+        steps = []
+        for path in paths:
+            # a file is only classified once it is complete, its content may decide the category
+            category = self.sorter.classifier.classify(path) if os.path.isfile(path) else None
+            if category:
+                fname = os.path.basename(path)
+                steps.append(("move", path, category, self.sorter._destination(category, fname), None))
+        self.sorter.classifier.commit()
+        if not steps:
+            return []
+        with metrics.measure("sorter", "watch_batch"):
+            if self.sorter.dedup:
+                steps = self.sorter.deduplicate(steps)
+            self.sorter.write_journal(steps)
+            file_log = file_log_of(self.sorter.execute(prune=False))
+        self.save_checkpoint()
+        return file_log
+
+    def run(self) -> None:
+        if os.path.exists(self.sorter.journal_path):
+            print(f"Resuming the interrupted sorting from {self.sorter.journal_path}.")
+            self.sorter.execute(prune=False)
+        if not self.load_checkpoint():
+            log(self.base_path, self.sorter.run())
+        self.reconcile()
+        # files that were still being written when the last run stopped
+        for path in list(self.writing):
+            if os.path.isfile(path):
+                self._add(path)
+        self.writing.clear()
+        print(f"Watching {self.base_path} for new files, press Ctrl+C to stop.")
+        try:
+            while True:
+                if self.due(time.monotonic()):
+                    log(self.base_path, self.flush())
+                ready, _, _ = select.select([self.inotify.fd], [], [], self.timeout(time.monotonic()))
+                if ready:
+                    for event in self.inotify.read():
+                        self.handle(*event)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.pending:
+                log(self.base_path, self.flush())
+            self.save_checkpoint()
+            self.sorter.classifier.close()
+            self.inotify.close()